@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # WhiteNoise Middleware
+    'generator.routers.DatabaseRoutingMiddleware', # Read-replica routing, before sessions
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,4 +96,96 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = 'generator:id_card_dashboard'
-LOGOUT_REDIRECT_URL = 'login' 
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'login'
+
+# Bulk invoice ingest API. Calls must send "Authorization: Bearer <token>";
+# the endpoint is disabled while no token is configured.
+INVOICE_INGEST_API_TOKEN = os.environ.get('INVOICE_INGEST_API_TOKEN', '')
+INVOICE_INGEST_MAX_BATCH = int(os.environ.get('INVOICE_INGEST_MAX_BATCH', 1000))
+
+# Change-feed API for HR and accounting syncs (see generator/changefeed.py),
+# with the same bearer-token scheme and disabled while no token is set.
+# CHANGE_FEED_PAGE_SIZE is the default page, CHANGE_FEED_MAX_PAGE_SIZE the cap.
+CHANGE_FEED_API_TOKEN = os.environ.get('CHANGE_FEED_API_TOKEN', '')
+CHANGE_FEED_PAGE_SIZE = int(os.environ.get('CHANGE_FEED_PAGE_SIZE', 500))
+CHANGE_FEED_MAX_PAGE_SIZE = int(os.environ.get('CHANGE_FEED_MAX_PAGE_SIZE', 2000))
+
+# Declarative document layouts (see generator/layouts.py). Extra directories
+# listed in DOCUMENT_LAYOUT_DIRS (separated by os.pathsep) are searched after
+# the built-in ones, so a file there can override a default layout.
+DOCUMENT_LAYOUT_DIRS = [BASE_DIR / 'generator' / 'document_layouts'] + [
+    path for path in os.environ.get('DOCUMENT_LAYOUT_DIRS', '').split(os.pathsep) if path
+]
+# Seconds between checks of the layout directories for edited files (every
+# render checks when this is 0, the default while DEBUG is on).
+DOCUMENT_LAYOUT_RELOAD_INTERVAL = int(os.environ.get('DOCUMENT_LAYOUT_RELOAD_INTERVAL', 0 if DEBUG else 30))
+# Layout name used for each document kind when a request does not pick one.
+DOCUMENT_LAYOUTS = {}
+
+# Dashboard preview images (see generator/previews.py): "webp" or "png", and
+# whether saves re-render previews in a background thread.
+DOCUMENT_PREVIEW_FORMAT = os.environ.get('DOCUMENT_PREVIEW_FORMAT', 'webp')
+DOCUMENT_PREVIEW_BACKGROUND = os.environ.get('DOCUMENT_PREVIEW_BACKGROUND', 'True') == 'True'
+
+# Most employees one combined welcome-package download may include; each one
+# adds a page rendered within the request.
+WELCOME_PACKAGE_MAX_EMPLOYEES = int(os.environ.get('WELCOME_PACKAGE_MAX_EMPLOYEES', 50))
+
+# Rendered PDFs are spooled in memory up to this many bytes, then on disk.
+PDF_SPOOL_MAX_MEMORY = int(os.environ.get('PDF_SPOOL_MAX_MEMORY', 512 * 1024))
+
+# Uploaded photos and logos are scaled down to at most this many pixels on
+# their long side (see generator/images.py).
+IMAGE_UPLOAD_MAX_DIMENSION = int(os.environ.get('IMAGE_UPLOAD_MAX_DIMENSION', 1600))
+
+# Concurrent downloads of the same document share one render (see
+# generator/coalesce.py): where finished renders are kept, how long a request
+# waits for another worker's render, and how long a finished one is reused.
+PDF_COALESCE_DIR = os.environ.get('PDF_COALESCE_DIR', os.path.join(tempfile.gettempdir(), 'dms-pdf-renders'))
+PDF_COALESCE_WAIT = float(os.environ.get('PDF_COALESCE_WAIT', 20))
+PDF_COALESCE_TTL = float(os.environ.get('PDF_COALESCE_TTL', 30))
+
+# Admission control for the PDF download views (see generator/admission.py):
+# renders running at once across all workers and per user, how many requests
+# may queue for a slot and for how long, and the Retry-After sent with a 503.
+RENDER_ADMISSION_DIR = os.environ.get('RENDER_ADMISSION_DIR', os.path.join(tempfile.gettempdir(), 'dms-admission'))
+RENDER_CONCURRENCY = int(os.environ.get('RENDER_CONCURRENCY', max(1, os.cpu_count() or 1)))
+RENDER_CONCURRENCY_PER_USER = int(os.environ.get('RENDER_CONCURRENCY_PER_USER', 2))
+RENDER_QUEUE_LENGTH = int(os.environ.get('RENDER_QUEUE_LENGTH', 4))
+RENDER_QUEUE_WAIT = float(os.environ.get('RENDER_QUEUE_WAIT', 5))
+RENDER_RETRY_AFTER = int(os.environ.get('RENDER_RETRY_AFTER', 5))
+
+# Render memory tracking (see generator/memory.py). Workers whose RSS floor
+# grows by more than RENDER_WORKER_MAX_GROWTH_MB (0 disables) restart
+# gracefully. RENDER_MEMORY_PROFILING adds tracemalloc figures per render and
+# the call paths that keep memory; `manage.py memory_report` shows them.
+RENDER_MEMORY_PROFILING = os.environ.get('RENDER_MEMORY_PROFILING', 'False') == 'True'
+RENDER_MEMORY_FRAMES = int(os.environ.get('RENDER_MEMORY_FRAMES', 10))
+RENDER_MEMORY_SNAPSHOT_EVERY = int(os.environ.get('RENDER_MEMORY_SNAPSHOT_EVERY', 100))
+RENDER_MEMORY_WINDOW = int(os.environ.get('RENDER_MEMORY_WINDOW', 50))
+RENDER_WORKER_MAX_GROWTH_MB = int(os.environ.get('RENDER_WORKER_MAX_GROWTH_MB', 256))
+RENDER_MEMORY_REPORT_DIR = os.environ.get('RENDER_MEMORY_REPORT_DIR', os.path.join(tempfile.gettempdir(), 'dms-memory'))
+
+# SQLite performance mode (see generator/sqlite.py): WAL, synchronous=NORMAL,
+# a memory map, a larger page cache and a busy timeout on every connection,
+# plus PRAGMA optimize and a passive WAL checkpoint every
+# SQLITE_MAINTENANCE_INTERVAL seconds. Has no effect on other database engines.
+SQLITE_PERFORMANCE_MODE = os.environ.get('SQLITE_PERFORMANCE_MODE', 'True') == 'True'
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KIB = int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 20000))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MAINTENANCE_INTERVAL = int(os.environ.get('SQLITE_MAINTENANCE_INTERVAL', 600))
+
+# Read replica (see generator/routers.py). With DATABASE_REPLICA_URL set,
+# read-only generator views and render jobs read from the 'replica' alias and
+# fall back to the primary when it is unreachable. After a write the browser
+# stays on the primary for DATABASE_REPLICA_STICKY_SECONDS, which should cover
+# the replica's lag. Tests use the primary for both aliases.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_REPLICA_ALIAS = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['generator.routers.ReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+DATABASE_REPLICA_RETRY_SECONDS = int(os.environ.get('DATABASE_REPLICA_RETRY_SECONDS', 30))
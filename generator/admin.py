@@ -1,7 +1,14 @@
 # generator/admin.py
-from django.contrib import admin
-from .models import CompanyInfo, Employee
-from .models import CompanyInfo, Employee, BusinessCard
+from django.contrib import admin, messages
+from django.db import router, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import CompanyInfo, Employee, BusinessCard, Invoice, InvoiceItem
+from .admission import admit, busy_message
+from .pdf_output import pdf_response
+from . import changefeed, previews
 
 
 class BusinessCardInline(admin.StackedInline):
@@ -10,8 +17,55 @@ class BusinessCardInline(admin.StackedInline):
     verbose_name_plural = 'Business Card Details'
     fk_name = 'employee'
     fields = ('personal_phone', 'personal_email', 'website_url')
+    # One card per employee; without a cap the formset renders spare forms.
+    max_num = 1
 
 
+class PreviewThumbnailMixin:
+    """
+    Adds a thumbnail column served from the preview image cache. Only
+    fingerprints are computed for the rows on the page; nothing is rendered.
+    """
+    preview_kind = None
+    preview_size = (0, 0)
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # Evaluates the page once; the template reuses the same instances.
+        previews.attach_preview_urls(self.preview_kind, changelist.result_list, CompanyInfo.objects.first())
+        return changelist
+
+    @admin.display(description='Preview')
+    def thumbnail(self, obj):
+        url = getattr(obj, 'preview_url', None)
+        if not url:
+            return '-'
+        width, height = self.preview_size
+        return format_html('<img src="{}" width="{}" height="{}" loading="lazy" alt="">', url, width, height)
+
+
+def _timestamped(prefix):
+    return f"{prefix}_{timezone.now():%Y%m%d_%H%M}.pdf"
+
+
+def _admitted_pdf(modeladmin, request, render, prefix):
+    """
+    Renders a bulk action's PDF within the render admission budget; when it
+    is used up the action is refused with a message instead.
+    """
+    with admit(request.user) as ticket:
+        if not ticket.admitted:
+            modeladmin.message_user(request, busy_message(ticket), messages.WARNING)
+            return None
+        return pdf_response(render(), _timestamped(prefix))
+
+
+def _company_info(modeladmin, request):
+    company_info = CompanyInfo.objects.first()
+    if company_info is None:
+        modeladmin.message_user(request, "Add the company information before generating documents.", messages.ERROR)
+    return company_info
+
 
 @admin.register(CompanyInfo)
 class CompanyInfoAdmin(admin.ModelAdmin):
@@ -27,7 +81,94 @@ class CompanyInfoAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Employee)
-class EmployeeAdmin(admin.ModelAdmin):
-    list_display = ('full_name', 'employee_id', 'job_title', 'department')
+class EmployeeAdmin(PreviewThumbnailMixin, admin.ModelAdmin):
+    list_display = ('thumbnail', 'full_name', 'employee_id', 'job_title', 'department', 'has_business_card')
+    list_display_links = ('full_name',)
+    list_select_related = ('business_card',)
     search_fields = ('full_name', 'employee_id', 'department')
-    inlines = (BusinessCardInline,)
\ No newline at end of file
+    inlines = (BusinessCardInline,)
+    actions = ('download_id_cards', 'print_business_cards', 'regenerate_qr_codes')
+    preview_kind = 'id_card'
+    preview_size = (85, 54)
+
+    @admin.display(description='Business card', boolean=True)
+    def has_business_card(self, obj):
+        return hasattr(obj, 'business_card')
+
+    @admin.action(description="Download ID cards for selected employees")
+    def download_id_cards(self, request, queryset):
+        from .pdf_utils import generate_id_cards_pdf
+        company_info = _company_info(self, request)
+        if company_info:
+            employees = queryset.order_by('full_name')
+            return _admitted_pdf(self, request, lambda: generate_id_cards_pdf(employees, company_info), 'ID_Cards')
+
+    @admin.action(description="Print business cards for selected employees")
+    def print_business_cards(self, request, queryset):
+        from .pdf_utils import generate_business_cards_pdf
+        company_info = _company_info(self, request)
+        if company_info:
+            employees = queryset.select_related('business_card').order_by('full_name')
+            return _admitted_pdf(self, request, lambda: generate_business_cards_pdf(employees, company_info), 'Business_Cards')
+
+    @admin.action(description="Regenerate QR codes for selected employees")
+    def regenerate_qr_codes(self, request, queryset):
+        employees = list(queryset)
+        for employee in employees:
+            employee.regenerate_qr_code()
+        using = router.db_for_write(Employee)
+        with transaction.atomic(using=using):
+            Employee.objects.bulk_update(employees, ['qr_code'])
+            # bulk_update sends no post_save signals.
+            changefeed.record(Employee, [employee.pk for employee in employees], using)
+        self.message_user(request, f"Regenerated {len(employees)} QR codes.", messages.SUCCESS)
+
+
+class InvoiceItemInline(admin.TabularInline):
+    model = InvoiceItem
+    fields = ('description', 'quantity', 'unit_price')
+    extra = 0
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(PreviewThumbnailMixin, admin.ModelAdmin):
+    list_display = ('thumbnail', 'invoice_number', 'client_name', 'issue_date', 'due_date', 'item_count', 'total')
+    list_display_links = ('invoice_number',)
+    search_fields = ('invoice_number', 'client_name')
+    date_hierarchy = 'issue_date'
+    ordering = ('-issue_date',)
+    inlines = (InvoiceItemInline,)
+    actions = ('export_invoices_pdf',)
+    # Skips the unfiltered COUNT(*) on every page of a large table.
+    show_full_result_count = False
+    preview_kind = 'invoice'
+    preview_size = (38, 53)
+
+    def get_queryset(self, request):
+        # Totals come from one aggregate join instead of a query per row;
+        # items are prefetched per page for the preview fingerprints.
+        return super().get_queryset(request).annotate(
+            item_count=Count('items'),
+            total=Coalesce(
+                Sum(F('items__quantity') * F('items__unit_price')),
+                Value(0),
+                output_field=DecimalField(max_digits=20, decimal_places=2),
+            ),
+        ).prefetch_related('items')
+
+    @admin.display(description='Items', ordering='item_count')
+    def item_count(self, obj):
+        return obj.item_count
+
+    @admin.display(description='Total (TZS)', ordering='total')
+    def total(self, obj):
+        return obj.total
+
+    @admin.action(description="Export selected invoices as one PDF")
+    def export_invoices_pdf(self, request, queryset):
+        from .pdf_utils import generate_invoices_pdf
+        company_info = _company_info(self, request)
+        if company_info:
+            # Items are prefetched chunk by chunk rather than for the whole selection.
+            invoices = queryset.order_by('issue_date', 'pk').iterator(chunk_size=500)
+            return _admitted_pdf(self, request, lambda: generate_invoices_pdf(invoices, company_info), 'Invoices')
@@ -0,0 +1,286 @@
+# generator/admission.py
+
+import functools
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers admit every request.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# ADMISSION CONTROL FOR RENDER VIEWS
+# ==============================================================================
+# PDF renders are CPU-bound and hold a worker thread for their whole run, so a
+# burst of downloads could leave no thread for dashboards and logins. Views
+# decorated with @admission_controlled need two slots before they run: one of
+# RENDER_CONCURRENCY slots shared by every worker on the host, and one of
+# RENDER_CONCURRENCY_PER_USER slots for the requesting user. A slot is an
+# flock() on a file in RENDER_ADMISSION_DIR, so the budget holds across
+# gunicorn workers and is given back by the kernel if a worker dies.
+#
+# - A user already at their own limit is turned away at once.
+# - When every shared slot is busy, up to RENDER_QUEUE_LENGTH requests wait
+#   up to RENDER_QUEUE_WAIT seconds for one; others are turned away at once.
+# - Turned-away requests get a 503 with Retry-After, which costs no render.
+#
+# Renders outside the decorated views (admin bulk actions, preview images
+# missing from the cache) take their slots with `with admit(user) as ticket:`.
+# Single-document downloads pass `render_slot(user)` to coalesce.render_once,
+# so a request served from a finished or in-flight render takes no slot and
+# only the request that actually renders is admitted.
+#
+# Counters of admitted, queued and rejected requests and the deepest queue
+# seen are kept in a small JSON file; see `manage.py render_admission`.
+
+ADMISSION_DIR = getattr(settings, 'RENDER_ADMISSION_DIR', os.path.join(tempfile.gettempdir(), 'dms-admission'))
+GLOBAL_LIMIT = getattr(settings, 'RENDER_CONCURRENCY', max(1, os.cpu_count() or 1))
+PER_USER_LIMIT = getattr(settings, 'RENDER_CONCURRENCY_PER_USER', 2)
+QUEUE_LENGTH = getattr(settings, 'RENDER_QUEUE_LENGTH', 4)
+QUEUE_WAIT = getattr(settings, 'RENDER_QUEUE_WAIT', 5)
+RETRY_AFTER = getattr(settings, 'RENDER_RETRY_AFTER', 5)
+POLL_INTERVAL = 0.05
+STATS_FILE = 'stats.json'
+COUNTERS = ('admitted', 'queued', 'rejected_user', 'rejected_queue_full', 'rejected_timeout')
+
+
+def _path(name):
+    return os.path.join(ADMISSION_DIR, name)
+
+
+def _try_lock(name):
+    """
+    Returns the open file if its lock was free, else None. Closing the file
+    releases the lock.
+    """
+    slot = open(_path(name), 'a+b')
+    try:
+        fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return slot
+    except BlockingIOError:
+        slot.close()
+        return None
+
+
+def _take_slot(prefix, count):
+    """
+    Takes the first free slot. Returns (file, index), or (None, count) when
+    all are taken; every slot before `index` was taken at the time.
+    """
+    for index in range(count):
+        slot = _try_lock(f'{prefix}-{index}.lock')
+        if slot is not None:
+            return slot, index
+    return None, count
+
+
+def _held(prefix, count):
+    """
+    How many of the slots are currently taken, by any process.
+    """
+    held = 0
+    for index in range(count):
+        slot = _try_lock(f'{prefix}-{index}.lock')
+        if slot is None:
+            held += 1
+        else:
+            slot.close()
+    return held
+
+
+# ==============================================================================
+# COUNTERS
+# ==============================================================================
+def _update_stats(counter, queue_depth=None):
+    with open(_path(STATS_FILE), 'a+') as stats_file:
+        fcntl.flock(stats_file, fcntl.LOCK_EX)
+        stats_file.seek(0)
+        try:
+            stats = json.loads(stats_file.read() or '{}')
+        except ValueError:
+            stats = {}
+        stats[counter] = stats.get(counter, 0) + 1
+        if queue_depth is not None:
+            stats['max_queue_depth'] = max(stats.get('max_queue_depth', 0), queue_depth)
+        stats_file.seek(0)
+        stats_file.truncate()
+        stats_file.write(json.dumps(stats))
+
+
+def read_stats():
+    """
+    The counters, plus the slots in use right now.
+    """
+    if fcntl is None:
+        return {}
+    os.makedirs(ADMISSION_DIR, exist_ok=True)
+    try:
+        with open(_path(STATS_FILE)) as stats_file:
+            stats = json.loads(stats_file.read() or '{}')
+    except (FileNotFoundError, ValueError):
+        stats = {}
+    stats = {**{counter: 0 for counter in COUNTERS}, 'max_queue_depth': 0, **stats}
+    stats['renders_running'] = _held('global', GLOBAL_LIMIT)
+    stats['queue_depth'] = _held('queue', QUEUE_LENGTH)
+    return stats
+
+
+def reset_stats():
+    if fcntl is not None and os.path.exists(_path(STATS_FILE)):
+        os.remove(_path(STATS_FILE))
+
+
+# ==============================================================================
+# ADMISSION
+# ==============================================================================
+class Ticket:
+    """
+    The slots held by one admitted request. `reason` is set when refused.
+    """
+
+    def __init__(self, slots=(), reason=None):
+        self.slots = list(slots)
+        self.reason = reason
+
+    @property
+    def admitted(self):
+        return self.reason is None
+
+    def release(self):
+        for slot in self.slots:
+            slot.close()
+        self.slots = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def admit(user):
+    """
+    Takes a per-user slot and a shared slot for `user`, waiting in the queue
+    for the shared one if needed.
+    """
+    if fcntl is None:
+        return Ticket()
+    os.makedirs(ADMISSION_DIR, exist_ok=True)
+    user_slot, _ = _take_slot(f'user-{user.pk}', PER_USER_LIMIT)
+    if user_slot is None:
+        _update_stats('rejected_user')
+        return Ticket(reason='user')
+    global_slot, _ = _take_slot('global', GLOBAL_LIMIT)
+    if global_slot is not None:
+        _update_stats('admitted')
+        return Ticket([user_slot, global_slot])
+
+    queue_slot, position = _take_slot('queue', QUEUE_LENGTH)
+    if queue_slot is None:
+        user_slot.close()
+        _update_stats('rejected_queue_full', queue_depth=QUEUE_LENGTH)
+        return Ticket(reason='queue_full')
+    _update_stats('queued', queue_depth=position + 1)
+    try:
+        deadline = time.monotonic() + QUEUE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            global_slot, _ = _take_slot('global', GLOBAL_LIMIT)
+            if global_slot is not None:
+                _update_stats('admitted')
+                return Ticket([user_slot, global_slot])
+    finally:
+        queue_slot.close()
+    user_slot.close()
+    _update_stats('rejected_timeout')
+    return Ticket(reason='timeout')
+
+
+def busy_message(ticket):
+    if ticket.reason == 'user':
+        return "You already have documents being generated. Please wait for them to finish."
+    return "The document service is busy. Please try again in a few seconds."
+
+
+def busy_response(ticket):
+    response = HttpResponse(busy_message(ticket), status=503, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+class RenderRefused(Exception):
+    """
+    Raised by render_slot() when the render is not admitted.
+    """
+
+    def __init__(self, ticket):
+        super().__init__(ticket.reason)
+        self.ticket = ticket
+
+
+@contextmanager
+def render_slot(user):
+    """
+    Holds `user`'s slots for the duration of the block, or raises
+    RenderRefused; answer that with busy_response(exc.ticket).
+    """
+    with admit(user) as ticket:
+        if not ticket.admitted:
+            logger.warning("Render refused (%s) for user %s.", ticket.reason, user.pk)
+            raise RenderRefused(ticket)
+        yield ticket
+
+
+class _ReleasingContent:
+    """
+    Streams `content` and releases `ticket` once it is exhausted or the
+    response is closed, whichever comes first.
+    """
+
+    def __init__(self, content, ticket):
+        self.content = content
+        self.ticket = ticket
+
+    def __iter__(self):
+        try:
+            yield from self.content
+        finally:
+            self.ticket.release()
+
+    def close(self):
+        self.ticket.release()
+
+
+def admission_controlled(view):
+    """
+    Runs the view only once admit() grants a slot, else answers 503. Apply
+    it below @login_required so requests are attributed to their user. A
+    streamed response other than a file (an export) is generated while it is
+    sent, so its slots are kept until the response is closed.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        ticket = admit(request.user)
+        if not ticket.admitted:
+            logger.warning("Render refused (%s) for user %s: %s", ticket.reason, request.user.pk, request.path)
+            return busy_response(ticket)
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            ticket.release()
+            raise
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = _ReleasingContent(response.streaming_content, ticket)
+        else:
+            ticket.release()
+        return response
+    return wrapper
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class GeneratorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'generator'
+
+    def ready(self):
+        # Connect the model signal handlers (search index upkeep) and the
+        # SQLite connection tuning.
+        from . import signals, sqlite  # noqa: F401
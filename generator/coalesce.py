@@ -0,0 +1,221 @@
+# generator/coalesce.py
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers render every request.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# SINGLE-FLIGHT PDF RENDERS
+# ==============================================================================
+# A shared link makes many people download the same document at once. Each
+# download is keyed by a fingerprint of everything the PDF is drawn from (the
+# records, the company version and the layout versions), and concurrent
+# requests for one key, in any gunicorn worker on the host, wait for a single
+# render and then read its output:
+#
+# - The first request takes an exclusive flock() on the key's own lock file
+#   and renders. The PDF is published to PDF_COALESCE_DIR with an atomic
+#   rename before the lock is released.
+# - Requests that arrive meanwhile poll the lock and the published file, and
+#   open the file as soon as it appears. A finished render is reused for
+#   PDF_COALESCE_TTL seconds; since the key changes with the content, a reused
+#   file is never stale. Renders of other documents never wait on each other.
+# - Expired results are swept together with their unused lock files. A lock
+#   file is only removed while holding its lock, and a request that locked a
+#   file which was removed meanwhile opens the new one and locks again.
+# - If the first render fails (or its worker dies, which drops the lock), the
+#   next waiter finds no file and renders itself. A waiter that has not got the
+#   lock after PDF_COALESCE_WAIT seconds renders on its own.
+# - Only a request that renders enters `slot()` (the caller's admission slot,
+#   see admission.py); one that reuses or joins a render holds no slot.
+
+COALESCE_DIR = getattr(settings, 'PDF_COALESCE_DIR', os.path.join(tempfile.gettempdir(), 'dms-pdf-renders'))
+WAIT_TIMEOUT = getattr(settings, 'PDF_COALESCE_WAIT', 20)
+RESULT_TTL = getattr(settings, 'PDF_COALESCE_TTL', 30)
+POLL_INTERVAL = 0.02
+
+
+def _values(instance):
+    if instance is None:
+        return None
+    return [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def document_key(entry_point, company_info, layout_kinds, layout, *records):
+    """
+    A fingerprint of one document: the pdf_utils entry point, the company
+    version, the version of every layout it draws and its records' values.
+    Raises LayoutError for an unknown layout name, like the render would.
+    """
+    from .layouts import company_version, get_layout
+    versions = [get_layout(kind, layout).version for kind in layout_kinds]
+    parts = [entry_point, layout, versions, company_version(company_info)]
+    for record in records:
+        if isinstance(record, (list, tuple)):
+            parts.append([_values(item) for item in record])
+        else:
+            parts.append(_values(record))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _open_fresh(path):
+    try:
+        shared = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    if time.time() - os.fstat(shared.fileno()).st_mtime > RESULT_TTL:
+        shared.close()
+        return None
+    return shared
+
+
+def _try_lock(lock_file):
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _is_current(lock_file, lock_path):
+    """
+    True if `lock_file` is still the file at `lock_path` (not swept away).
+    """
+    try:
+        return os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _lock(lock_path, result_path, timeout):
+    """
+    Waits for the key's lock. Returns (lock_file, None) once the lock is held,
+    (None, shared) if another render published the result meanwhile, or
+    (None, None) after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        lock_file = open(lock_path, 'a+b')
+        while not _try_lock(lock_file):
+            shared = _open_fresh(result_path)
+            if shared is not None or time.monotonic() >= deadline:
+                lock_file.close()
+                return None, shared
+            time.sleep(POLL_INTERVAL)
+        if _is_current(lock_file, lock_path):
+            return lock_file, None
+        lock_file.close()
+
+
+def _sweep(now):
+    names = set(os.listdir(COALESCE_DIR))
+    for name in [name for name in names if name.endswith('.pdf')]:
+        try:
+            if now - os.stat(os.path.join(COALESCE_DIR, name)).st_mtime > RESULT_TTL:
+                os.remove(os.path.join(COALESCE_DIR, name))
+                names.discard(name)
+        except FileNotFoundError:
+            names.discard(name)
+    for name in names:
+        if name.endswith('.lock') and f'{name[:-len(".lock")]}.pdf' not in names:
+            # Only an idle lock is removed, and only while holding it.
+            path = os.path.join(COALESCE_DIR, name)
+            try:
+                with open(path, 'a+b') as lock_file:
+                    if _try_lock(lock_file) and _is_current(lock_file, path):
+                        os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _publish(output, path):
+    # Open readers keep their copy if the file is replaced or swept.
+    with tempfile.NamedTemporaryFile(dir=COALESCE_DIR, suffix='.tmp', delete=False) as published:
+        output.seek(0)
+        shutil.copyfileobj(output, published)
+    os.replace(published.name, path)
+    output.seek(0)
+    _sweep(time.time())
+
+
+def _render(render, slot):
+    with slot():
+        return render()
+
+
+def render_once(key, render, slot=nullcontext):
+    """
+    Returns a binary file holding the output of `render()` for `key`, shared
+    with every concurrent call for the same key. `render()` runs inside
+    `slot()`, which may raise to refuse the render.
+    """
+    if fcntl is None:
+        return _render(render, slot)
+    os.makedirs(COALESCE_DIR, exist_ok=True)
+    result_path = os.path.join(COALESCE_DIR, f'{key}.pdf')
+    shared = _open_fresh(result_path)
+    if shared is not None:
+        logger.info("Render %s: reused a finished render.", key[:12])
+        return shared
+
+    waited = time.monotonic()
+    lock_file, shared = _lock(os.path.join(COALESCE_DIR, f'{key}.lock'), result_path, WAIT_TIMEOUT)
+    if shared is not None:
+        logger.info("Render %s: shared after waiting %.0f ms.", key[:12], (time.monotonic() - waited) * 1000)
+        return shared
+    if lock_file is None:
+        logger.warning("Render %s: no result after %ss, rendering independently.", key[:12], WAIT_TIMEOUT)
+        return _render(render, slot)
+    with lock_file:
+        try:
+            shared = _open_fresh(result_path)
+            if shared is not None:
+                logger.info("Render %s: shared after waiting %.0f ms.", key[:12], (time.monotonic() - waited) * 1000)
+                return shared
+            output = _render(render, slot)
+            _publish(output, result_path)
+            return output
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ==============================================================================
+# COALESCED ENTRY POINTS
+# ==============================================================================
+# The single-document pdf_utils entry points behind the download views.
+# Invoices should have their items prefetched, so the key and the render
+# read the same rows.
+
+def generate_id_card_pdf(employee, company_info, layout=None, slot=nullcontext):
+    from . import pdf_utils
+    key = document_key('id_card', company_info, ('id_card',), layout, employee)
+    return render_once(key, lambda: pdf_utils.generate_id_card_pdf(employee, company_info, layout), slot)
+
+
+def generate_invoice_pdf(invoice, company_info, layout=None, slot=nullcontext):
+    from . import pdf_utils
+    key = document_key('invoice', company_info, ('invoice',), layout, invoice, list(invoice.items.all()))
+    return render_once(key, lambda: pdf_utils.generate_invoice_pdf(invoice, company_info, layout), slot)
+
+
+def generate_welcome_package_pdf(employee, invoice, company_info, layout=None, slot=nullcontext):
+    from . import pdf_utils
+    key = document_key(
+        'welcome_package', company_info, ('invoice', 'id_card', 'business_card'), layout,
+        employee, getattr(employee, 'business_card', None), invoice, list(invoice.items.all()),
+    )
+    return render_once(
+        key, lambda: pdf_utils.generate_welcome_package_pdf(employee, invoice, company_info, layout), slot
+    )
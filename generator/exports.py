@@ -0,0 +1,291 @@
+# generator/exports.py
+
+import csv
+import datetime
+import decimal
+import re
+import zipfile
+from django.db.models import Case, CharField, Count, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from xml.sax.saxutils import escape
+from .models import Invoice, InvoiceItem
+
+# ==============================================================================
+# ACCOUNTING EXPORT
+# ==============================================================================
+# Invoices or their line items are read with .iterator(chunk_size=...) (a
+# server-side cursor on PostgreSQL), with every total computed by the
+# database, and written row by row into a generator of bytes that a
+# StreamingHttpResponse sends as it goes. Nothing holds more than one chunk
+# of rows, so the export runs in constant memory however many rows it has.
+
+CHUNK_SIZE = 2000
+# Rows are grouped into one yielded chunk to keep per-write overhead low.
+ROWS_PER_WRITE = 500
+
+STATUS_OPEN = 'open'
+STATUS_OVERDUE = 'overdue'
+STATUS_NO_DUE_DATE = 'no_due_date'
+# There is no payment tracking yet, so the status follows the due date.
+STATUS_CHOICES = (
+    (STATUS_OPEN, 'Open (not yet due)'),
+    (STATUS_OVERDUE, 'Overdue'),
+    (STATUS_NO_DUE_DATE, 'No due date'),
+)
+
+MONEY = DecimalField(max_digits=20, decimal_places=2)
+
+
+def _status_expression(now, prefix=''):
+    due_date = f'{prefix}due_date'
+    return Case(
+        When(**{f'{due_date}__isnull': True}, then=Value(STATUS_NO_DUE_DATE)),
+        When(**{f'{due_date}__lt': now}, then=Value(STATUS_OVERDUE)),
+        default=Value(STATUS_OPEN),
+        output_field=CharField(),
+    )
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def _filter(queryset, filters, prefix=''):
+    """
+    Applies the export filters to a queryset of invoices (prefix '') or of
+    items (prefix 'invoice__').
+    """
+    # Dates become datetime bounds in the current time zone; a __date lookup
+    # would cast the column and keep the database off the issue_date index.
+    if filters.get('date_from'):
+        queryset = queryset.filter(**{f'{prefix}issue_date__gte': _start_of_day(filters['date_from'])})
+    if filters.get('date_to'):
+        next_day = filters['date_to'] + datetime.timedelta(days=1)
+        queryset = queryset.filter(**{f'{prefix}issue_date__lt': _start_of_day(next_day)})
+    if filters.get('client'):
+        queryset = queryset.filter(**{f'{prefix}client_name__icontains': filters['client']})
+    if filters.get('status'):
+        queryset = queryset.filter(export_status=filters['status'])
+    return queryset
+
+
+def invoice_rows(filters, using=None):
+    """
+    One row per invoice with its item count, quantity and amount totals.
+    """
+    queryset = Invoice.objects.using(using).annotate(
+        export_status=_status_expression(timezone.now()),
+        item_count=Count('items'),
+        total_quantity=Coalesce(Sum('items__quantity'), Value(0), output_field=MONEY),
+        total_amount=Coalesce(Sum(F('items__quantity') * F('items__unit_price')), Value(0), output_field=MONEY),
+    )
+    queryset = _filter(queryset, filters).order_by('issue_date', 'id').values_list(
+        'invoice_number', 'issue_date', 'due_date', 'export_status', 'client_name', 'client_phone',
+        'terms_of_payment', 'item_count', 'total_quantity', 'total_amount',
+    )
+    return queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+INVOICE_HEADER = (
+    'Invoice number', 'Issue date', 'Due date', 'Status', 'Client', 'Client phone',
+    'Terms of payment', 'Items', 'Total quantity', 'Total amount (TZS)',
+)
+
+
+def item_rows(filters, using=None):
+    """
+    One row per line item, with its invoice's details and the line total.
+    """
+    queryset = InvoiceItem.objects.using(using).annotate(
+        export_status=_status_expression(timezone.now(), prefix='invoice__'),
+        line_total=ExpressionWrapper(F('quantity') * F('unit_price'), output_field=MONEY),
+    )
+    queryset = _filter(queryset, filters, prefix='invoice__').order_by('invoice__issue_date', 'invoice_id', 'id')
+    queryset = queryset.values_list(
+        'invoice__invoice_number', 'invoice__issue_date', 'invoice__due_date', 'export_status',
+        'invoice__client_name', 'description', 'quantity', 'unit_price', 'line_total',
+    )
+    return queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+ITEM_HEADER = (
+    'Invoice number', 'Issue date', 'Due date', 'Status', 'Client',
+    'Description', 'Quantity', 'Unit price (TZS)', 'Line total (TZS)',
+)
+
+EXPORTS = {
+    'invoices': (INVOICE_HEADER, invoice_rows),
+    'items': (ITEM_HEADER, item_rows),
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    return '' if value is None else value
+
+
+# ==============================================================================
+# CSV
+# ==============================================================================
+class _Buffer:
+    """
+    A write-only file whose contents are collected and handed back in chunks.
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(part if isinstance(part, bytes) else part.encode() for part in self.parts)
+        self.parts = []
+        return data
+
+
+def stream_csv(header, rows, title=''):
+    buffer = _Buffer()
+    # A byte-order mark lets Excel open the UTF-8 file with the right encoding.
+    buffer.write('\ufeff')
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_plain(value) for value in row])
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+# ==============================================================================
+# XLSX
+# ==============================================================================
+# A minimal SpreadsheetML package written through zipfile into a non-seekable
+# sink, so each part is compressed and sent as it is produced. Strings are
+# stored inline (no shared-strings table to build up in memory); dates and
+# datetimes are real Excel dates with a number format.
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 0: default, 1: bold header, 2: date-time, 3: two-decimal number.
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+# Control characters that XML 1.0 cannot carry, even escaped.
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xlsx_cell(value, style=0):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        serial = (value - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="2"><v>{serial:.6f}</v></c>'
+    if isinstance(value, decimal.Decimal):
+        return f'<c s="3"><v>{value}</v></c>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    style_attribute = f' s="{style}"' if style else ''
+    text = escape(_XML_ILLEGAL_RE.sub('', str(value)))
+    return f'<c t="inlineStr"{style_attribute}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _workbook_xml(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def stream_xlsx(header, rows, title='Export'):
+    sink = _Buffer()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            package.writestr(name, content)
+        package.writestr('xl/workbook.xml', _workbook_xml(title))
+        yield sink.drain()
+
+        with package.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+                '</sheetView></sheetViews><sheetData>'
+                '<row>' + ''.join(_xlsx_cell(title, style=1) for title in header) + '</row>'
+            ).encode())
+            lines = []
+            for row in rows:
+                lines.append('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>')
+                if len(lines) == ROWS_PER_WRITE:
+                    sheet.write(''.join(lines).encode())
+                    lines = []
+                    yield sink.drain()
+            sheet.write((''.join(lines) + '</sheetData></worksheet>').encode())
+    yield sink.drain()
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
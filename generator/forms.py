@@ -0,0 +1,69 @@
+# generator/forms.py
+
+from django import forms
+from django.forms import inlineformset_factory
+from .models import Invoice, InvoiceItem
+from . import exports
+
+# ==============================================================================
+# INVOICE FORMS
+# ==============================================================================
+# Shared by the HTML invoice form and the JSON ingest API so both paths apply
+# exactly the same validation before anything is written.
+
+class InvoiceForm(forms.ModelForm):
+    class Meta:
+        model = Invoice
+        fields = (
+            'issue_date', 'due_date', 'client_name', 'client_address',
+            'client_phone', 'other_comments', 'terms_of_payment',
+        )
+
+
+class InvoiceItemForm(forms.ModelForm):
+    class Meta:
+        model = InvoiceItem
+        fields = ('description', 'quantity', 'unit_price')
+
+
+InvoiceItemFormSet = inlineformset_factory(
+    Invoice, InvoiceItem, form=InvoiceItemForm,
+    extra=1, can_delete=True
+)
+
+
+# ==============================================================================
+# ACCOUNTING EXPORT FORM
+# ==============================================================================
+class InvoiceExportForm(forms.Form):
+    format = forms.ChoiceField(
+        choices=(('csv', 'CSV'), ('xlsx', 'Excel (XLSX)')), required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    rows = forms.ChoiceField(
+        choices=(('items', 'Line items'), ('invoices', 'Invoices')), required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    date_from = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
+    )
+    date_to = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}),
+    )
+    client = forms.CharField(
+        max_length=255, required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Client'}),
+    )
+    status = forms.ChoiceField(
+        choices=(('', 'Any status'),) + exports.STATUS_CHOICES, required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        cleaned_data['rows'] = cleaned_data.get('rows') or 'items'
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("The start date must be on or before the end date.")
+        return cleaned_data
@@ -0,0 +1,170 @@
+# generator/images.py
+
+import functools
+import io
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from imagekit.cachefiles.backends import CacheFileState
+from imagekit.utils import process_image
+from PIL import Image, ImageOps
+from .models import CompanyInfo, Employee
+
+# ==============================================================================
+# UPLOADED IMAGE PIPELINE
+# ==============================================================================
+# Employee photos and company logos are normalised once, when they are
+# uploaded: the EXIF orientation is applied, colours are converted to sRGB,
+# the image is capped at IMAGE_UPLOAD_MAX_DIMENSION pixels on its long side
+# and re-encoded without metadata. The ImageKit variants (web thumbnails and
+# the print-resolution photo) are then cut from the same decoded image, so
+# neither the dashboards nor the PDF renderers ever open a phone-sized
+# original. Existing files are converted with `manage.py normalize_images`.
+
+MAX_DIMENSION = getattr(settings, 'IMAGE_UPLOAD_MAX_DIMENSION', 1600)
+
+# Stored format of each image field and the ImageKit specs generated from it.
+IMAGE_FIELDS = {
+    Employee: ('photo', 'JPEG', ('photo_thumbnail', 'photo_print')),
+    CompanyInfo: ('logo', 'PNG', ('logo_thumbnail',)),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+}
+# Info keys that carry metadata rather than pixels.
+METADATA_KEYS = ('exif', 'icc_profile', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+
+# ImageCms (and its C extension) is only needed for uploads that carry a
+# colour profile, so it is imported there rather than in every process that
+# loads the signal handlers.
+@functools.lru_cache(maxsize=None)
+def _srgb_profile():
+    from PIL import ImageCms
+    return ImageCms.createProfile('sRGB')
+
+
+def _to_srgb(image):
+    icc_profile = image.info.get('icc_profile')
+    if not icc_profile or image.mode not in ('RGB', 'RGBA', 'CMYK'):
+        return image
+    from PIL import ImageCms
+    try:
+        source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+        output_mode = 'RGBA' if image.mode == 'RGBA' else 'RGB'
+        return ImageCms.profileToProfile(image, source, _srgb_profile(), outputMode=output_mode)
+    except (ImageCms.PyCMSError, OSError, ValueError):
+        # An unreadable profile is dropped and the pixels kept as they are.
+        return image
+
+
+def _flatten(image, fmt):
+    """
+    Converts to a mode `fmt` can store. JPEG has no alpha, so transparent
+    areas become white; PNG keeps transparency as RGBA.
+    """
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    if fmt == 'PNG':
+        return image.convert('RGBA' if has_alpha else 'RGB') if image.mode not in ('RGB', 'RGBA') else image
+    if has_alpha:
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def open_normalized(file, fmt, max_dimension=MAX_DIMENSION):
+    """
+    Decodes an image file upright, in sRGB, in a mode `fmt` can store and no
+    larger than `max_dimension` on its long side.
+    """
+    image = Image.open(file)
+    if image.format == 'JPEG':
+        # Lets libjpeg decode at 1/2, 1/4 or 1/8 scale instead of full size.
+        long_side = max(image.size)
+        if long_side > max_dimension:
+            image.draft(None, tuple(-(-side * max_dimension // long_side) for side in image.size))
+    image = ImageOps.exif_transpose(image)
+    image = _flatten(_to_srgb(image), fmt)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    # Some encoders copy profiles and text chunks from here when saving.
+    image.info = {}
+    return image
+
+
+def encode(image, fmt):
+    """
+    Encodes the image in `fmt` without any metadata.
+    """
+    output = io.BytesIO()
+    image.save(output, fmt, **SAVE_OPTIONS[fmt])
+    return output.getvalue()
+
+
+def stored_name(name, fmt):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f"{stem}.{EXTENSIONS[fmt]}"
+
+
+def is_normalized(file, fmt, max_dimension=MAX_DIMENSION):
+    """
+    True if a stored file already looks like the pipeline's output. Only the
+    header is read.
+    """
+    image = Image.open(file)
+    return (
+        image.format == fmt
+        and max(image.size) <= max_dimension
+        and not any(key in image.info for key in METADATA_KEYS)
+    )
+
+
+# ==============================================================================
+# MODEL INTEGRATION
+# ==============================================================================
+def normalize_upload(instance):
+    """
+    Replaces a newly assigned, not yet stored image on `instance` with its
+    normalised version. Returns the decoded image for generate_variants(), or
+    None when there is no new upload.
+    """
+    field_name, fmt, _ = IMAGE_FIELDS[type(instance)]
+    field_file = getattr(instance, field_name)
+    if not field_file or field_file._committed:
+        return None
+    image = open_normalized(field_file.file, fmt)
+    name = stored_name(field_file.name, fmt)
+    # FileField.pre_save() stores whatever file is attached under this name.
+    field_file.file = ContentFile(encode(image, fmt), name=name)
+    field_file.name = name
+    return image
+
+
+def generate_variants(instance, image):
+    """
+    Writes the ImageKit variants of `instance`'s stored image from an already
+    decoded copy, using each spec's own processors and output options.
+    """
+    _, _, spec_names = IMAGE_FIELDS[type(instance)]
+    for spec_name in spec_names:
+        cachefile = getattr(instance, spec_name)
+        spec = cachefile.generator
+        content = process_image(
+            image.copy(), processors=spec.processors, format=spec.format,
+            autoconvert=spec.autoconvert, options=spec.options,
+        )
+        if cachefile.storage.exists(cachefile.name):
+            cachefile.storage.delete(cachefile.name)
+        cachefile.storage.save(cachefile.name, ContentFile(content.read()))
+        cachefile.cachefile_backend.set_state(cachefile, CacheFileState.EXISTS)
+
+
+def variant_names(instance):
+    """
+    Storage names of the variants of the image currently on `instance`.
+    """
+    _, _, spec_names = IMAGE_FIELDS[type(instance)]
+    return [getattr(instance, spec_name).name for spec_name in spec_names]
@@ -0,0 +1,199 @@
+# generator/ingest.py
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from .forms import InvoiceForm, InvoiceItemForm
+from .models import Invoice, InvoiceItem
+from . import changefeed, search
+
+# ==============================================================================
+# BULK INVOICE INGEST
+# ==============================================================================
+# A batch is validated in full before the database is touched. If every record
+# is valid, the invoices and their items are written in one transaction with
+# two bulk_create calls; otherwise nothing is written and the per-record
+# errors are returned so the caller can fix and resend the batch.
+
+MAX_BATCH_SIZE = getattr(settings, 'INVOICE_INGEST_MAX_BATCH', 1000)
+BULK_CREATE_BATCH_SIZE = 500
+NUMBER_ALLOCATION_ATTEMPTS = 3
+# Records are checked with the models' own field validation on the same
+# fields the HTML forms expose; building a ModelForm per record costs several
+# times more than the validation itself on large batches.
+INVOICE_FIELDS = InvoiceForm._meta.fields
+ITEM_FIELDS = InvoiceItemForm._meta.fields
+DATETIME_FIELDS = ('issue_date', 'due_date')
+
+
+class IngestError(Exception):
+    """
+    Raised when a batch payload is malformed as a whole (not per record).
+    """
+
+
+def _clean_instance(instance, data, fields, exclude):
+    """
+    Copies `fields` from `data` onto an unsaved instance and runs the model's
+    own field validation. Returns an error dict in the same shape as
+    `form.errors.get_json_data()`, or None.
+    """
+    for name in fields:
+        if name in data:
+            setattr(instance, name, data[name])
+    try:
+        instance.full_clean(exclude=exclude, validate_unique=False)
+    except ValidationError as exc:
+        return {
+            field: [
+                {'message': message, 'code': error.code or 'invalid'}
+                for error in errors for message in error.messages
+            ]
+            for field, errors in exc.error_dict.items()
+        }
+    return None
+
+
+def _validate_record(record):
+    """
+    Validates one invoice dict and its items. Returns (invoice, items, errors)
+    where invoice and items are unsaved model instances.
+    """
+    if not isinstance(record, dict):
+        return None, [], {'__all__': [{'message': "Each invoice must be a JSON object.", 'code': 'invalid'}]}
+
+    errors = {}
+    invoice = Invoice()
+    invoice_errors = _clean_instance(invoice, record, INVOICE_FIELDS, exclude=['invoice_number'])
+    if invoice_errors:
+        errors.update(invoice_errors)
+    elif settings.USE_TZ:
+        # Match form behaviour: naive datetimes are taken in the current time zone.
+        for name in DATETIME_FIELDS:
+            value = getattr(invoice, name)
+            if value is not None and timezone.is_naive(value):
+                setattr(invoice, name, timezone.make_aware(value))
+
+    raw_items = record.get('items')
+    if not isinstance(raw_items, list) or not raw_items:
+        errors['items'] = [{'message': "At least one item is required.", 'code': 'required'}]
+        raw_items = []
+
+    items = []
+    item_errors = {}
+    for position, raw_item in enumerate(raw_items):
+        item = InvoiceItem()
+        item_error = _clean_instance(item, raw_item if isinstance(raw_item, dict) else {}, ITEM_FIELDS, exclude=['invoice'])
+        if item_error:
+            item_errors[str(position)] = item_error
+        else:
+            items.append(item)
+    if item_errors:
+        errors['items'] = item_errors
+
+    if errors:
+        return None, [], errors
+    return invoice, items, None
+
+
+def validate_batch(records):
+    """
+    Validates every record in the batch. Returns (validated, results) where
+    `validated` is a list of (invoice, items) pairs, or None if any record
+    failed, and `results` holds one status dict per record.
+    """
+    if not isinstance(records, list):
+        raise IngestError("Expected a list of invoices.")
+    if not records:
+        raise IngestError("The batch is empty.")
+    if len(records) > MAX_BATCH_SIZE:
+        raise IngestError(f"A batch may contain at most {MAX_BATCH_SIZE} invoices.")
+
+    validated = []
+    results = []
+    for index, record in enumerate(records):
+        invoice, items, errors = _validate_record(record)
+        if errors:
+            results.append({'index': index, 'status': 'invalid', 'errors': errors})
+        else:
+            validated.append((invoice, items))
+            results.append({'index': index, 'status': 'valid'})
+
+    if len(validated) != len(records):
+        return None, results
+    return validated, results
+
+
+def _write_batch(validated, using):
+    invoices = [invoice for invoice, items in validated]
+    for invoice, number in zip(invoices, Invoice.allocate_invoice_numbers(len(invoices), using=using)):
+        invoice.invoice_number = number
+
+    Invoice.objects.using(using).bulk_create(invoices, batch_size=BULK_CREATE_BATCH_SIZE)
+
+    # Backends that cannot return primary keys from bulk inserts need one
+    # lookup to map the freshly allocated numbers back to their rows.
+    if any(invoice.pk is None for invoice in invoices):
+        ids = dict(
+            Invoice.objects.using(using)
+            .filter(invoice_number__in=[invoice.invoice_number for invoice in invoices])
+            .values_list('invoice_number', 'id')
+        )
+        for invoice in invoices:
+            invoice.pk = ids[invoice.invoice_number]
+
+    items = []
+    for invoice, invoice_items in validated:
+        for item in invoice_items:
+            item.invoice = invoice
+            items.append(item)
+    InvoiceItem.objects.using(using).bulk_create(items, batch_size=BULK_CREATE_BATCH_SIZE)
+
+    # bulk_create skips the post_save signals, so refresh the search index
+    # and record the change-feed entries here.
+    invoice_ids = [invoice.pk for invoice in invoices]
+    item_ids = [item.pk for item in items]
+    if any(item_id is None for item_id in item_ids):
+        item_ids = InvoiceItem.objects.using(using).filter(invoice_id__in=invoice_ids).values_list('pk', flat=True)
+    changefeed.record(Invoice, invoice_ids, using)
+    changefeed.record(InvoiceItem, item_ids, using)
+    transaction.on_commit(lambda: search.index_invoices(invoice_ids, using=using), using=using)
+
+
+def ingest_invoices(records):
+    """
+    Validates and writes a batch of invoice dicts. Returns (created, results).
+    `created` is False when nothing was written because a record was invalid.
+    """
+    validated, results = validate_batch(records)
+    if validated is None:
+        return False, results
+
+    using = router.db_for_write(Invoice)
+    for attempt in range(NUMBER_ALLOCATION_ATTEMPTS):
+        try:
+            with transaction.atomic(using=using):
+                _write_batch(validated, using)
+            break
+        except IntegrityError:
+            # A concurrent writer took some of the allocated numbers; retry
+            # with a fresh allocation from unsaved instances.
+            if attempt == NUMBER_ALLOCATION_ATTEMPTS - 1:
+                raise
+            for invoice, items in validated:
+                for instance in [invoice, *items]:
+                    instance.pk = None
+                    instance._state.adding = True
+
+    results = []
+    for index, (invoice, items) in enumerate(validated):
+        results.append({
+            'index': index,
+            'status': 'created',
+            'id': invoice.pk,
+            'invoice_number': invoice.invoice_number,
+            'item_count': len(items),
+            'total': str(sum((item.get_total() for item in items), 0)),
+        })
+    return True, results
@@ -0,0 +1,497 @@
+# generator/layouts.py
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from django.conf import settings
+from PIL import Image
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import mm, inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# DECLARATIVE DOCUMENT LAYOUTS
+# ==============================================================================
+# Card and invoice layouts are JSON files (see generator/document_layouts/). A layout
+# has one or more faces ("front", "back", "page"), each a list of elements in
+# layout units. The first time a face is drawn for a given layout version and
+# company version it is compiled into a flat list of draw operations: colours,
+# fonts, geometry and every company-only value (text, images) are resolved
+# up front, so a render only fills in the per-record fields.
+#
+# Elements that only use company data are "static" and are always painted
+# beneath the per-record ("dynamic") elements, which lets the static layer be
+# cached as a reusable PDF form. A text element marked "optional" is skipped
+# when any of its fields is empty instead of printing its default.
+#
+# Variants: drop another JSON file with the same "kind" and a new "name" into
+# one of settings.DOCUMENT_LAYOUT_DIRS, then select it with
+# settings.DOCUMENT_LAYOUTS[kind] or the views' ?layout=<name> parameter.
+#
+# The layout directories are checked for added, removed or edited files at
+# most every DOCUMENT_LAYOUT_RELOAD_INTERVAL seconds. A file that cannot be
+# loaded is logged and skipped; the other layouts stay available.
+
+UNITS = {'pt': 1, 'mm': mm, 'in': inch}
+COMPANY_ROOT = 'company'
+RECORD_ROOTS = ('employee', 'card', 'invoice')
+DEFAULT_LAYOUT_NAME = 'default'
+COMPILE_CACHE_SIZE = 256
+RELOAD_INTERVAL = getattr(settings, 'DOCUMENT_LAYOUT_RELOAD_INTERVAL', 30)
+# Company images are stored at this resolution for their drawn size.
+PRINT_DPI = 300
+
+_FIELD_RE = re.compile(r'\{([^{}]+)\}')
+_TRANSFORMS = {'upper': str.upper, 'lower': str.lower, 'title': str.title}
+_ALIGNMENTS = ('left', 'center', 'right')
+
+
+class LayoutError(Exception):
+    """
+    Raised for an unknown layout or an invalid layout definition.
+    """
+
+
+# Blocks are named, code-defined elements for content that is not a fixed
+# shape (e.g. the invoice item table). pdf_utils registers them.
+BLOCKS = {}
+
+
+def register_block(name):
+    def decorator(function):
+        BLOCKS[name] = function
+        return function
+    return decorator
+
+
+# ==============================================================================
+# FIELD TEMPLATES
+# ==============================================================================
+def _parse_path(path, source):
+    parts = tuple(path.strip().split('.'))
+    if parts[0] not in (COMPANY_ROOT,) + RECORD_ROOTS:
+        raise LayoutError(f"Unknown field root '{parts[0]}' in {source!r}.")
+    if any(not part or part.startswith('_') for part in parts):
+        raise LayoutError(f"Invalid field path '{path}' in {source!r}.")
+    return parts
+
+
+def _resolve(context, path):
+    value = context.get(path[0])
+    for attribute in path[1:]:
+        if value is None:
+            return None
+        value = getattr(value, attribute, None)
+    return value
+
+
+class Template:
+    """
+    A text template such as "Phone: {card.personal_phone|company.phone}".
+    Each {...} holds one or more field paths separated by "|"; the first
+    non-empty one wins, otherwise `default` is used.
+    """
+
+    def __init__(self, source, default='', transform=None):
+        if transform and transform not in _TRANSFORMS:
+            raise LayoutError(f"Unknown transform '{transform}'.")
+        self.default = default
+        self.transform = _TRANSFORMS.get(transform)
+        self.parts = []
+        self.roots = set()
+        position = 0
+        for match in _FIELD_RE.finditer(source):
+            self.parts.append(source[position:match.start()])
+            alternatives = tuple(_parse_path(path, source) for path in match.group(1).split('|'))
+            self.roots.update(path[0] for path in alternatives)
+            self.parts.append(alternatives)
+            position = match.end()
+        self.parts.append(source[position:])
+
+    @property
+    def is_static(self):
+        return self.roots <= {COMPANY_ROOT}
+
+    def is_empty(self, context):
+        """
+        True when any field resolves to nothing (used by "optional" elements).
+        """
+        return any(
+            all(_resolve(context, path) in (None, '') for path in part)
+            for part in self.parts if not isinstance(part, str)
+        )
+
+    def render(self, context):
+        pieces = []
+        for part in self.parts:
+            if isinstance(part, str):
+                pieces.append(part)
+                continue
+            value = None
+            for path in part:
+                value = _resolve(context, path)
+                if value not in (None, ''):
+                    break
+            pieces.append(self.default if value in (None, '') else str(value))
+        text = ''.join(pieces)
+        return self.transform(text) if self.transform else text
+
+
+# ==============================================================================
+# ELEMENT COMPILERS
+# ==============================================================================
+# Each compiler returns (is_static, operation) where operation(p, context)
+# performs the draw with everything but record values already resolved.
+
+def _color(value):
+    return HexColor(value) if value else None
+
+
+def _font(name):
+    # Loads the font metrics once at compile time and fails fast on typos.
+    try:
+        pdfmetrics.getFont(name)
+    except KeyError:
+        raise LayoutError(f"Unknown font '{name}'.")
+    return name
+
+
+def _compile_rect(element, scale, company_context):
+    x, y, w, h = (element[key] * scale for key in ('x', 'y', 'w', 'h'))
+    fill = _color(element.get('fill'))
+    stroke = _color(element.get('stroke'))
+    line_width = element.get('line_width', 1)
+
+    def operation(p, context):
+        if fill is not None:
+            p.setFillColor(fill)
+        if stroke is not None:
+            p.setStrokeColor(stroke)
+            p.setLineWidth(line_width)
+        p.rect(x, y, w, h, fill=int(fill is not None), stroke=int(stroke is not None))
+    return True, operation
+
+
+def _compile_line(element, scale, company_context):
+    x1, y1, x2, y2 = (element[key] * scale for key in ('x1', 'y1', 'x2', 'y2'))
+    stroke = _color(element.get('stroke', '#000000'))
+    line_width = element.get('line_width', 1)
+
+    def operation(p, context):
+        p.setStrokeColor(stroke)
+        p.setLineWidth(line_width)
+        p.line(x1, y1, x2, y2)
+    return True, operation
+
+
+def _compile_text(element, scale, company_context):
+    template = Template(element['value'], element.get('default', ''), element.get('transform'))
+    x, y = element['x'] * scale, element['y'] * scale
+    font = _font(element.get('font', 'Helvetica'))
+    size = element.get('size', 9)
+    color = _color(element.get('color', '#000000'))
+    align = element.get('align', 'left')
+    if align not in _ALIGNMENTS:
+        raise LayoutError(f"Unknown text alignment '{align}'.")
+    rotate = element.get('rotate', 0)
+    optional = element.get('optional', False)
+    if template.is_static:
+        static_text = None if optional and template.is_empty(company_context) else template.render(company_context)
+        if static_text is None:
+            return True, lambda p, context: None
+
+    def operation(p, context):
+        if template.is_static:
+            text = static_text
+        else:
+            # Record fields may fall back to company ones ("{card.x|company.x}").
+            context = {**company_context, **context}
+            if optional and template.is_empty(context):
+                return
+            text = template.render(context)
+        p.setFillColor(color)
+        p.setFont(font, size)
+        if rotate:
+            p.saveState()
+            p.rotate(rotate)
+        if align == 'left':
+            p.drawString(x, y, text)
+        elif align == 'center':
+            p.drawCentredString(x, y, text)
+        else:
+            p.drawRightString(x, y, text)
+        if rotate:
+            p.restoreState()
+    return template.is_static, operation
+
+
+def _image_path(field):
+    # `field` may be an ImageKit spec; truthiness generates it if needed.
+    if not field:
+        return None
+    return os.path.join(settings.MEDIA_ROOT, field.name)
+
+
+def _print_ready_image(image_path, width, height):
+    """
+    Opens a company image, shrunk to PRINT_DPI at its drawn size when that
+    size is known. A full-size logo would otherwise be re-encoded into every
+    document at its original resolution.
+    """
+    image = Image.open(image_path)
+    if width and height:
+        limit = (math.ceil(width / 72 * PRINT_DPI), math.ceil(height / 72 * PRINT_DPI))
+        if image.width > limit[0] or image.height > limit[1]:
+            image.thumbnail(limit, Image.LANCZOS)
+    image.load()
+    return ImageReader(image)
+
+
+def _compile_image(element, scale, company_context):
+    path = _parse_path(element['source'], element['source'])
+    x, y = element['x'] * scale, element['y'] * scale
+    width = element['w'] * scale if element.get('w') is not None else None
+    height = element['h'] * scale if element.get('h') is not None else None
+    options = {'preserveAspectRatio': element.get('preserve_aspect_ratio', True)}
+    if element.get('mask'):
+        options['mask'] = element['mask']
+
+    if path[0] == COMPANY_ROOT:
+        # Decode company images once per company version, not per render.
+        reader = None
+        try:
+            image_path = _image_path(_resolve(company_context, path))
+            if image_path:
+                reader = _print_ready_image(image_path, width, height)
+        except Exception:
+            reader = None
+
+        def operation(p, context):
+            if reader is not None:
+                try: p.drawImage(reader, x, y, width=width, height=height, **options)
+                except Exception: pass
+        return True, operation
+
+    def operation(p, context):
+        try:
+            image_path = _image_path(_resolve(context, path))
+            if image_path:
+                p.drawImage(image_path, x, y, width=width, height=height, **options)
+        except Exception:
+            pass
+    return False, operation
+
+
+def _compile_block(element, scale, company_context):
+    name = element['name']
+    if name not in BLOCKS:
+        raise LayoutError(f"Unknown block '{name}'.")
+    function = BLOCKS[name]
+    params = dict(element)
+    for key in ('x', 'y', 'top', 'width', 'height'):
+        if key in params:
+            params[key] = params[key] * scale
+
+    def operation(p, context):
+        # Blocks see the company too, even though it is not a record root.
+        function(p, {**company_context, **context}, params)
+    return False, operation
+
+
+ELEMENT_COMPILERS = {
+    'rect': _compile_rect,
+    'line': _compile_line,
+    'text': _compile_text,
+    'image': _compile_image,
+    'block': _compile_block,
+}
+
+
+# ==============================================================================
+# COMPILED FACES AND LAYOUTS
+# ==============================================================================
+class CompiledFace:
+    """
+    One layout face compiled for one company version: a flat list of static
+    operations (company-only) and dynamic operations (per record).
+    """
+
+    def __init__(self, width, height, static_ops, dynamic_ops):
+        self.width = width
+        self.height = height
+        self.static_ops = static_ops
+        self.dynamic_ops = dynamic_ops
+
+    def _run(self, p, operations, context, x, y):
+        moved = bool(x or y)
+        if moved:
+            p.saveState()
+            p.translate(x, y)
+        for operation in operations:
+            operation(p, context)
+        if moved:
+            p.restoreState()
+
+    def draw_static(self, p, x=0, y=0):
+        self._run(p, self.static_ops, {}, x, y)
+
+    def draw_dynamic(self, p, context, x=0, y=0):
+        self._run(p, self.dynamic_ops, context, x, y)
+
+    def draw(self, p, context, x=0, y=0):
+        self.draw_static(p, x, y)
+        self.draw_dynamic(p, context, x, y)
+
+
+class Layout:
+    """
+    A layout definition loaded from JSON.
+    """
+
+    def __init__(self, definition, version, source):
+        try:
+            self.kind = definition['kind']
+            self.name = definition.get('name', DEFAULT_LAYOUT_NAME)
+            self.scale = UNITS[definition.get('units', 'pt')]
+            self.faces = definition['faces']
+        except KeyError as exc:
+            raise LayoutError(f"{source}: missing or invalid {exc}.")
+        self.version = version
+        self.source = source
+
+    def compile_face(self, face, company_info):
+        if face not in self.faces:
+            raise LayoutError(f"Layout '{self.kind}/{self.name}' has no '{face}' face.")
+        definition = self.faces[face]
+        company_context = {COMPANY_ROOT: company_info}
+        static_ops, dynamic_ops = [], []
+        for element in definition.get('elements', []):
+            compiler = ELEMENT_COMPILERS.get(element.get('type'))
+            if compiler is None:
+                raise LayoutError(f"{self.source}: unknown element type {element.get('type')!r}.")
+            try:
+                is_static, operation = compiler(element, self.scale, company_context)
+            except KeyError as exc:
+                raise LayoutError(f"{self.source}: {element.get('type')} element is missing {exc}.")
+            (static_ops if is_static else dynamic_ops).append(operation)
+        width, height = (value * self.scale for value in definition['size'])
+        return CompiledFace(width, height, static_ops, dynamic_ops)
+
+
+_lock = threading.Lock()
+_registry = {}
+_registry_stamp = None
+_registry_checked = None
+_compiled = {}
+
+
+def _layout_files():
+    files = []
+    for directory in getattr(settings, 'DOCUMENT_LAYOUT_DIRS', []):
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            continue
+        for file_name in names:
+            if file_name.endswith('.json'):
+                path = os.path.join(directory, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(files)
+
+
+def _load_layout(path):
+    with open(path, 'rb') as handle:
+        raw = handle.read()
+    try:
+        definition = json.loads(raw)
+    except ValueError as exc:
+        raise LayoutError(f"{path}: invalid JSON ({exc}).")
+    if not isinstance(definition, dict):
+        raise LayoutError(f"{path}: a layout must be a JSON object.")
+    return Layout(definition, hashlib.sha1(raw).hexdigest()[:12], path)
+
+
+def _load_registry():
+    """
+    (Re)loads the layout files when any of them was added, removed or edited.
+    Files that fail to load are logged and left out.
+    """
+    global _registry, _registry_stamp
+    stamp = _layout_files()
+    if stamp == _registry_stamp:
+        return _registry
+    registry = {}
+    for path, mtime, size in stamp:
+        try:
+            layout = _load_layout(path)
+        except (LayoutError, OSError) as exc:
+            logger.error("Skipping document layout: %s", exc)
+            continue
+        registry[(layout.kind, layout.name)] = layout
+    _registry, _registry_stamp = registry, stamp
+    return registry
+
+
+def _current_registry():
+    """
+    Returns the registry, checking the layout files at most every
+    RELOAD_INTERVAL seconds.
+    """
+    global _registry_checked
+    checked = _registry_checked
+    if checked is not None and time.monotonic() - checked < RELOAD_INTERVAL:
+        return _registry
+    with _lock:
+        if _registry_checked is checked:
+            _load_registry()
+            _registry_checked = time.monotonic()
+        return _registry
+
+
+def get_layout(kind, name=None):
+    """
+    Returns the named layout of `kind`, or the configured default.
+    """
+    name = name or getattr(settings, 'DOCUMENT_LAYOUTS', {}).get(kind, DEFAULT_LAYOUT_NAME)
+    try:
+        return _current_registry()[(kind, name)]
+    except KeyError:
+        raise LayoutError(f"No '{kind}' layout named '{name}'.")
+
+
+def company_version(company_info):
+    """
+    A key that changes whenever the company record is saved.
+    """
+    if company_info is None:
+        return None
+    return (company_info.pk, company_info.updated_at)
+
+
+def get_face(kind, face, company_info, name=None):
+    """
+    Returns the compiled face, compiling it on first use for this layout
+    version and company version.
+    """
+    layout = get_layout(kind, name)
+    key = (layout.kind, layout.name, layout.version, face, company_version(company_info))
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = layout.compile_face(face, company_info)
+        with _lock:
+            if len(_compiled) >= COMPILE_CACHE_SIZE:
+                _compiled.clear()
+            _compiled[key] = compiled
+    return compiled
@@ -0,0 +1,261 @@
+# generator/loadtest.py
+
+import os
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+# ==============================================================================
+# LOAD-TEST HARNESS
+# ==============================================================================
+# A small, dependency-free load generator used by the `loadtest` management
+# command. Each virtual user logs in once with its own cookie jar and then
+# loops over a weighted scenario of real pages until the run ends. Latency is
+# recorded per step so slow render endpoints do not hide behind fast pages.
+
+# Each step is (name, weight, url_template). Templates are filled with a random
+# employee or invoice id picked from the seeded database.
+SCENARIOS = {
+    'browse': [
+        ('id_card_dashboard', 3, '/dashboard/'),
+        ('employee_list', 3, '/employees/'),
+        ('invoice_dashboard', 3, '/invoices/'),
+        ('invoice_preview', 2, '/invoices/preview/{invoice_id}/'),
+        ('id_card_tangible_preview', 2, '/preview/tangible/{employee_id}/'),
+        ('business_card_preview', 1, '/business-card/preview/{employee_id}/'),
+    ],
+    'render': [
+        ('download_invoice_pdf', 3, '/invoices/download/pdf/{invoice_id}/'),
+        ('download_id_card_pdf', 3, '/download/pdf/{employee_id}/'),
+        ('download_welcome_package', 1, '/package/download/{employee_id}/{invoice_id}/'),
+    ],
+}
+# Large multi-page documents: a welcome package for every employee at once.
+SCENARIOS['batch'] = [
+    ('download_welcome_packages', 1, '/package/download/invoice/{invoice_id}/'),
+]
+SCENARIOS['mixed'] = SCENARIOS['browse'] + [
+    ('download_invoice_pdf', 1, '/invoices/download/pdf/{invoice_id}/'),
+    ('download_id_card_pdf', 1, '/download/pdf/{employee_id}/'),
+]
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class StepStats:
+    """
+    Latencies (in seconds) and error count for one scenario step.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': (self.errors / count) if count else 0.0,
+            'throughput': count / duration if duration else 0.0,
+            'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+
+
+class VirtualUser(threading.Thread):
+    """
+    One logged-in browser session replaying the scenario until `deadline`.
+    """
+
+    def __init__(self, harness, number):
+        super().__init__(name=f'loadtest-user-{number}', daemon=True)
+        self.harness = harness
+        self.random = random.Random(harness.seed + number)
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        self.login_error = None
+
+    def _request(self, path, data=None):
+        request = urllib.request.Request(self.harness.base_url + path, data=data)
+        if data is not None:
+            request.add_header('Referer', self.harness.base_url + path)
+        with self.opener.open(request, timeout=self.harness.timeout) as response:
+            # Read the whole body so PDF downloads are timed end to end.
+            response.read()
+
+    def login(self):
+        self._request('/accounts/login/')
+        cookies = self._cookies()
+        payload = urllib.parse.urlencode({
+            'username': self.harness.username,
+            'password': self.harness.password,
+            'csrfmiddlewaretoken': cookies.get('csrftoken', ''),
+        }).encode()
+        self._request('/accounts/login/', data=payload)
+        if 'sessionid' not in self._cookies():
+            raise RuntimeError("Login failed; check the load-test username and password.")
+
+    def _cookies(self):
+        for handler in self.opener.handlers:
+            if isinstance(handler, urllib.request.HTTPCookieProcessor):
+                return {cookie.name: cookie.value for cookie in handler.cookiejar}
+        return {}
+
+    def run(self):
+        try:
+            self.login()
+        except Exception as exc:  # Reported by the harness, not raised in the thread.
+            self.login_error = exc
+            return
+        steps = self.harness.steps
+        weights = [weight for name, weight, template in steps]
+        while time.monotonic() < self.harness.deadline:
+            name, weight, template = self.random.choices(steps, weights=weights)[0]
+            path = template.format(
+                employee_id=self.random.choice(self.harness.employee_ids),
+                invoice_id=self.random.choice(self.harness.invoice_ids),
+            )
+            started = time.perf_counter()
+            failed = False
+            try:
+                self._request(path)
+            except (urllib.error.URLError, OSError):
+                failed = True
+            self.harness.record(name, time.perf_counter() - started, failed)
+
+
+class ProcessMemorySampler(threading.Thread):
+    """
+    Samples the resident memory of a server process and its children (the
+    gunicorn master and its workers) from /proc until stopped. Linux only.
+    """
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(name='loadtest-memory', daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self.peak_total = 0
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def _rss_kib(pid):
+        try:
+            with open(f'/proc/{pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def _children(self):
+        children = []
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as stat:
+                    # The parent pid is the second field after the ")" closing the name.
+                    parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if parent == self.pid:
+                children.append(int(entry))
+        return children
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            total = 0
+            for pid in self._children():
+                rss = self._rss_kib(pid)
+                total += rss
+                self.peaks[pid] = max(self.peaks.get(pid, 0), rss)
+            self.peak_total = max(self.peak_total, total)
+
+    def stop(self):
+        """
+        Stops sampling and returns the peak worker and total worker RSS in MiB.
+        """
+        self._stopped.set()
+        self.join()
+        return {
+            'workers': len(self.peaks),
+            'peak_worker_rss_mib': max(self.peaks.values(), default=0) / 1024,
+            'peak_total_rss_mib': self.peak_total / 1024,
+        }
+
+
+class LoadTestHarness:
+    """
+    Runs `concurrency` virtual users against `base_url` for `duration` seconds.
+    """
+
+    def __init__(self, base_url, username, password, employee_ids, invoice_ids,
+                 scenario='mixed', concurrency=8, duration=30, timeout=60, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.username = username
+        self.password = password
+        self.employee_ids = list(employee_ids)
+        self.invoice_ids = list(invoice_ids)
+        self.steps = SCENARIOS[scenario]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.timeout = timeout
+        self.seed = seed
+        self.deadline = 0.0
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, failed):
+        with self._lock:
+            stats = self.stats.setdefault(name, StepStats())
+            stats.latencies.append(latency)
+            if failed:
+                stats.errors += 1
+
+    def run(self):
+        """
+        Runs the load test and returns a report dict with per-step and total
+        throughput, latency percentiles and error rates.
+        """
+        users = [VirtualUser(self, number) for number in range(self.concurrency)]
+        self.deadline = time.monotonic() + self.duration
+        started = time.monotonic()
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - started
+
+        login_errors = [user.login_error for user in users if user.login_error]
+        if len(login_errors) == len(users):
+            raise login_errors[0]
+
+        total = StepStats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            total.errors += stats.errors
+        return {
+            'elapsed': elapsed,
+            'concurrency': self.concurrency,
+            'login_errors': len(login_errors),
+            'steps': {name: stats.summary(elapsed) for name, stats in sorted(self.stats.items())},
+            'total': total.summary(elapsed),
+        }
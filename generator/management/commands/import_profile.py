@@ -0,0 +1,68 @@
+# generator/management/commands/import_profile.py
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORTTIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+# Mirrors what a worker, a management command and the warm-up hook each load.
+TARGETS = {
+    'worker': "import django; django.setup(); import dms_project.urls; import dms_project.wsgi",
+    'command': "import django; django.setup()",
+    'warmup': "import django; django.setup(); import dms_project.urls; "
+              "from generator.warmup import warm_up; warm_up()",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures cold-start import time in fresh interpreters and reports which "
+        "top-level packages account for it (python -X importtime)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=sorted(TARGETS), default='worker')
+        parser.add_argument('--runs', type=int, default=5, help="Cold starts to time (median is reported).")
+        parser.add_argument('--top', type=int, default=15, help="Number of packages to list.")
+
+    def _run(self, code, importtime=False):
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        command += ['-c', code]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'dms_project.settings'))
+        started = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr else "Import failed.")
+        return elapsed, result.stderr
+
+    def handle(self, *args, **options):
+        code = TARGETS[options['target']]
+        baseline = statistics.median(self._run("pass")[0] for _ in range(options['runs']))
+        wall = statistics.median(self._run(code)[0] for _ in range(options['runs']))
+
+        _, trace = self._run(code, importtime=True)
+        by_package = Counter()
+        for line in trace.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match:
+                by_package[match.group(4).split('.')[0]] += int(match.group(1))
+        total_us = sum(by_package.values())
+
+        self.stdout.write(
+            f"target '{options['target']}': {wall * 1000:.0f} ms wall "
+            f"({(wall - baseline) * 1000:.0f} ms over a bare interpreter), "
+            f"{total_us / 1000:.0f} ms in imports"
+        )
+        self.stdout.write(f"{'package':<28}{'self ms':>10}{'share':>8}")
+        for package, micros in by_package.most_common(options['top']):
+            self.stdout.write(f"{package:<28}{micros / 1000:>10.1f}{micros / total_us:>8.1%}")
@@ -0,0 +1,108 @@
+# generator/management/commands/loadtest.py
+
+import json
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from generator.loadtest import LoadTestHarness, ProcessMemorySampler, SCENARIOS
+from generator.models import Employee, Invoice
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a scripted load test (login, dashboards, previews, PDF downloads) against "
+        "a running server and reports throughput, p50/p95/p99 latency and error rate. "
+        "Seed data first with `seed_loadtest_data`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=int, default=30, help="Seconds to run.")
+        parser.add_argument('--timeout', type=int, default=60, help="Per-request timeout in seconds.")
+        parser.add_argument(
+            '--spawn', action='store_true',
+            help="Start gunicorn with gunicorn.conf.py on --base-url for the duration of the run "
+                 "and report the peak memory of its workers.",
+        )
+        parser.add_argument(
+            '--gunicorn-arg', action='append', default=[], dest='gunicorn_args',
+            help="Extra argument passed to the spawned gunicorn, e.g. --gunicorn-arg=--workers=4.",
+        )
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def _spawn_gunicorn(self, base_url, extra_args):
+        host_port = base_url.split('://', 1)[-1].rstrip('/')
+        command = [
+            sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+            '--bind', host_port, *extra_args, 'dms_project.wsgi:application',
+        ]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR)
+        host, port = host_port.rsplit(':', 1)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError("gunicorn exited before it started listening.")
+            try:
+                socket.create_connection((host, int(port)), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError("gunicorn did not start listening within 30 seconds.")
+
+    def handle(self, *args, **options):
+        employee_ids = list(Employee.objects.values_list('id', flat=True))
+        invoice_ids = list(Invoice.objects.values_list('id', flat=True))
+        if not employee_ids or not invoice_ids:
+            raise CommandError("No employees or invoices found; run `manage.py seed_loadtest_data` first.")
+
+        server = self._spawn_gunicorn(options['base_url'], options['gunicorn_args']) if options['spawn'] else None
+        sampler = ProcessMemorySampler(server.pid) if server else None
+        if sampler:
+            sampler.start()
+        try:
+            harness = LoadTestHarness(
+                options['base_url'], options['username'], options['password'],
+                employee_ids, invoice_ids,
+                scenario=options['scenario'], concurrency=options['concurrency'],
+                duration=options['duration'], timeout=options['timeout'],
+            )
+            report = harness.run()
+            if sampler:
+                report['memory'] = sampler.stop()
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=30)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{options['scenario']} scenario, {report['concurrency']} users, {report['elapsed']:.1f}s"
+        )
+        header = f"{'step':<28}{'reqs':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = list(report['steps'].items()) + [('TOTAL', report['total'])]
+        for name, step in rows:
+            self.stdout.write(
+                f"{name:<28}{step['requests']:>7}{step['throughput']:>9.1f}{step['p50_ms']:>9.1f}"
+                f"{step['p95_ms']:>9.1f}{step['p99_ms']:>9.1f}{step['error_rate']:>8.1%}"
+            )
+        if 'memory' in report:
+            memory = report['memory']
+            self.stdout.write(
+                f"peak worker RSS {memory['peak_worker_rss_mib']:.1f} MiB, "
+                f"peak RSS of all {memory['workers']} workers {memory['peak_total_rss_mib']:.1f} MiB"
+            )
+        if report['login_errors']:
+            self.stdout.write(self.style.WARNING(f"{report['login_errors']} virtual users failed to log in."))
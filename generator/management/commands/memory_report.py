@@ -0,0 +1,96 @@
+# generator/management/commands/memory_report.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from generator import memory
+from generator.models import CompanyInfo, Employee, Invoice
+
+MIB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows render memory per worker (RSS floor growth, per-generator allocations) and the "
+        "call paths that retain memory, from the reports written by the workers. With --render, "
+        "profiles renders in this process instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--render', type=int, default=0, metavar='N',
+                            help="Render N documents here with tracemalloc on and report on them.")
+        parser.add_argument('--kind', choices=('invoice', 'id_card', 'welcome_package'), default='invoice',
+                            help="Document rendered with --render.")
+        parser.add_argument('--top', type=int, default=10, help="Number of growth sites to show.")
+        parser.add_argument('--frames', type=int, default=6, help="Frames shown per growth site.")
+
+    def handle(self, *args, **options):
+        if options['render']:
+            reports = [self._profile(options['render'], options['kind'])]
+        else:
+            reports = memory.read_reports()
+            if not reports:
+                raise CommandError(
+                    f"No worker reports in {memory.REPORT_DIR}. Workers write one after their first "
+                    f"{memory.WINDOW} renders; use --render to profile here instead."
+                )
+        for report in reports:
+            self._show_worker(report)
+        self._show_sites(reports, options['top'], options['frames'])
+
+    def _profile(self, count, kind):
+        from generator import pdf_utils
+        company_info = CompanyInfo.objects.first()
+        invoices = list(Invoice.objects.prefetch_related('items').order_by('pk')[:50])
+        employees = list(Employee.objects.select_related('business_card').order_by('pk')[:50])
+        if company_info is None or not invoices or not employees:
+            raise CommandError("Seed some data first (manage.py seed_loadtest_data).")
+        window = max(1, min(memory.WINDOW, count // 4))
+        tracker = memory.reset(profiling=True, window=window, snapshot_every=count + 1, max_growth_mb=0)
+        started = time.perf_counter()
+        for number in range(count):
+            invoice, employee = invoices[number % len(invoices)], employees[number % len(employees)]
+            if kind == 'invoice':
+                output = pdf_utils.generate_invoice_pdf(invoice, company_info)
+            elif kind == 'id_card':
+                output = pdf_utils.generate_id_card_pdf(employee, company_info)
+            else:
+                output = pdf_utils.generate_welcome_package_pdf(employee, invoice, company_info)
+            output.close()
+        tracker.compare_snapshot()
+        self.stdout.write(f"Rendered {count} {kind} documents in {time.perf_counter() - started:.1f}s.")
+        return tracker.report()
+
+    def _show_worker(self, report):
+        baseline = report['baseline_floor']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Worker {report['pid']}: {report['renders']} renders, RSS {report['rss'] / MIB:.0f} MiB, "
+            f"floor {report['rss_floor'] / MIB:.0f} MiB"
+            + (f" ({report['growth'] / MIB:+.1f} MiB since the first window)" if baseline else "")
+            + (" - recycling" if report['recycling'] else "")
+        ))
+        for name, stats in sorted(report['generators'].items()):
+            line = f"  {name:<32} {stats['renders']:>6} renders {stats['seconds'] / stats['renders'] * 1000:>7.1f} ms"
+            if report['profiling']:
+                line += (
+                    f"  retained {stats['retained'] / stats['renders'] / 1024:>8.1f} KiB/render"
+                    f"  peak {stats['max_peak'] / 1024:>8.0f} KiB"
+                )
+            self.stdout.write(line)
+
+    def _show_sites(self, reports, top, frames):
+        sites = {}
+        for report in reports:
+            for site in report['growth_sites']:
+                key = tuple(site['traceback'])
+                total = sites.setdefault(key, {'size_diff': 0, 'count_diff': 0})
+                total['size_diff'] += site['size_diff']
+                total['count_diff'] += site['count_diff']
+        if not sites:
+            self.stdout.write("No growth sites recorded (set RENDER_MEMORY_PROFILING=True on the workers).")
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING("Call paths holding more memory than at the baseline:"))
+        ranked = sorted(sites.items(), key=lambda item: item[1]['size_diff'], reverse=True)[:top]
+        for traceback, total in ranked:
+            self.stdout.write(f"  {total['size_diff'] / 1024:+.1f} KiB in {total['count_diff']:+d} blocks")
+            for frame in traceback[-frames:]:
+                self.stdout.write(f"      {frame}")
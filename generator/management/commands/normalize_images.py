@@ -0,0 +1,68 @@
+# generator/management/commands/normalize_images.py
+
+import os
+import time
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from generator import images
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs existing employee photos and company logos through the upload pipeline: "
+        "applies EXIF orientation, caps the resolution, strips metadata and pre-generates "
+        "the thumbnail and print variants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report which files would be converted.")
+        parser.add_argument('--keep-originals', action='store_true',
+                            help="Leave the original files and their old variants in storage.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        converted = skipped = missing = 0
+        bytes_before = bytes_after = 0
+        for model, (field_name, fmt, _) in images.IMAGE_FIELDS.items():
+            for instance in model.objects.exclude(**{field_name: ''}).order_by('pk').iterator(chunk_size=200):
+                field_file = getattr(instance, field_name)
+                storage, old_name = field_file.storage, field_file.name
+                if not storage.exists(old_name):
+                    missing += 1
+                    self.stderr.write(f"{model.__name__} {instance.pk}: {old_name} is missing.")
+                    continue
+                with storage.open(old_name) as source:
+                    if images.is_normalized(source, fmt):
+                        skipped += 1
+                        continue
+                    source.seek(0)
+                    content = source.read()
+                if options['dry_run']:
+                    converted += 1
+                    self.stdout.write(f"Would convert {old_name} ({len(content)} bytes).")
+                    continue
+
+                old_variants = [name for name in images.variant_names(instance) if storage.exists(name)]
+                # Assigning a plain File makes the save go through the upload
+                # pipeline (see signals.normalize_uploaded_image).
+                setattr(instance, field_name, ContentFile(content, name=os.path.basename(old_name)))
+                update_fields = [field_name] + (['updated_at'] if hasattr(instance, 'updated_at') else [])
+                with transaction.atomic():
+                    instance.save(update_fields=update_fields)
+                new_name = getattr(instance, field_name).name
+                if not options['keep_originals']:
+                    for name in [old_name] + old_variants:
+                        if name != new_name:
+                            storage.delete(name)
+                converted += 1
+                bytes_before += len(content)
+                bytes_after += storage.size(new_name)
+                self.stdout.write(f"{old_name} -> {new_name}")
+
+        verb = 'to convert' if options['dry_run'] else 'converted'
+        summary = f"{converted} {verb}, {skipped} already normalised, {missing} missing"
+        if bytes_before:
+            summary += f"; {bytes_before / 1024:.0f} KiB -> {bytes_after / 1024:.0f} KiB"
+        self.stdout.write(self.style.SUCCESS(f"{summary} in {time.perf_counter() - started:.1f}s."))
@@ -0,0 +1,21 @@
+# generator/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+from generator import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index over invoices and their line items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to rebuild the index on.")
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search.is_supported(using):
+            self.stdout.write(self.style.WARNING(
+                "This database has no native full-text index; searches fall back to substring matching."
+            ))
+            return
+        count = search.rebuild_index(using=using)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} invoices."))
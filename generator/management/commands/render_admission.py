@@ -0,0 +1,26 @@
+# generator/management/commands/render_admission.py
+
+from django.core.management.base import BaseCommand
+from generator import admission
+
+
+class Command(BaseCommand):
+    help = "Shows the render admission counters and the slots in use across all workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Clear the counters after showing them.")
+
+    def handle(self, *args, **options):
+        stats = admission.read_stats()
+        if not stats:
+            self.stdout.write("Admission control needs fcntl; every render is admitted on this platform.")
+            return
+        self.stdout.write(
+            f"Limits: {admission.GLOBAL_LIMIT} renders, {admission.PER_USER_LIMIT} per user, "
+            f"queue of {admission.QUEUE_LENGTH} for up to {admission.QUEUE_WAIT}s."
+        )
+        for name in ('renders_running', 'queue_depth') + admission.COUNTERS + ('max_queue_depth',):
+            self.stdout.write(f"  {name:<20} {stats[name]}")
+        if options['reset']:
+            admission.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters cleared."))
@@ -0,0 +1,39 @@
+# generator/management/commands/render_previews.py
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from generator import previews, routers
+from generator.models import CompanyInfo, Employee, Invoice
+
+
+class Command(BaseCommand):
+    help = "Renders any missing dashboard preview images for ID cards and invoices."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(previews.PREVIEW_WIDTHS), action='append',
+                            help="Document kind to render (repeatable; default: all).")
+        parser.add_argument('--format', dest='fmt', choices=sorted(previews.PREVIEW_FORMATS),
+                            default=previews.DEFAULT_FORMAT, help="Image format to render.")
+
+    def handle(self, *args, **options):
+        # A bulk job that only reads the database: use the replica if there is one.
+        with routers.replica_reads():
+            self._render(options)
+
+    def _render(self, options):
+        company_info = CompanyInfo.objects.first()
+        if company_info is None:
+            raise CommandError("Add the company information before rendering previews.")
+        querysets = {
+            'id_card': Employee.objects.order_by('pk'),
+            'invoice': Invoice.objects.prefetch_related('items').order_by('pk'),
+        }
+        for kind in options['kind'] or sorted(querysets):
+            started = time.perf_counter()
+            count = 0
+            for instance in querysets[kind].iterator(chunk_size=200):
+                previews.ensure_preview(kind, instance, company_info, options['fmt'])
+                count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind}: {count} previews up to date in {time.perf_counter() - started:.1f}s."
+            ))
@@ -0,0 +1,90 @@
+# generator/management/commands/seed_loadtest_data.py
+
+import random
+from decimal import Decimal
+from io import BytesIO
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from generator.models import CompanyInfo, Employee, BusinessCard
+from generator.ingest import ingest_invoices
+
+DEPARTMENTS = ['Operations', 'Finance', 'Sales', 'Engineering', 'Logistics']
+JOB_TITLES = ['Technician', 'Accountant', 'Sales Officer', 'Site Engineer', 'Driver']
+ITEM_DESCRIPTIONS = [
+    'Ceramic floor tiling', 'Wall plastering', 'Gypsum ceiling works',
+    'Terrazzo polishing', 'Roof waterproofing', 'Paving blocks supply',
+]
+
+
+class Command(BaseCommand):
+    help = "Seeds employees, invoices and a login user for the load-test harness."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=50)
+        parser.add_argument('--invoices', type=int, default=200)
+        parser.add_argument('--items-per-invoice', type=int, default=5)
+        parser.add_argument('--username', default='loadtest')
+        parser.add_argument('--password', default='loadtest')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _photo(self, rng):
+        # A phone-sized photo so image decode cost is realistic.
+        image = Image.new('RGB', (1200, 1600), tuple(rng.randrange(256) for _ in range(3)))
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        return ContentFile(buffer.getvalue())
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        User = get_user_model()
+        user, created = User.objects.get_or_create(username=options['username'])
+        user.set_password(options['password'])
+        user.save()
+
+        if not CompanyInfo.objects.exists():
+            CompanyInfo.objects.create(
+                address='1234', phone='+255 700 000 000', email='info@example.com',
+                bank_name='CRDB Bank', account_number='0150000000000', account_name='HIGHLAND COMPANY LTD',
+                tin_number='100-000-000',
+            )
+
+        for number in range(options['employees']):
+            employee = Employee(
+                full_name=f'Load Test Employee {number}',
+                job_title=rng.choice(JOB_TITLES),
+                department=rng.choice(DEPARTMENTS),
+            )
+            employee.photo.save(f'loadtest_{number}.jpg', self._photo(rng), save=False)
+            with transaction.atomic():
+                employee.save()
+                BusinessCard.objects.create(employee=employee, personal_phone='+255 711 000 000')
+
+        records = []
+        for number in range(options['invoices']):
+            records.append({
+                'issue_date': (timezone.now() - timezone.timedelta(days=rng.randrange(365))).isoformat(),
+                'client_name': f'Load Test Client {number}',
+                'client_address': f'Plot {rng.randrange(1, 999)}, Dodoma',
+                'other_comments': 'Seeded for load testing.',
+                'terms_of_payment': '30 days',
+                'items': [
+                    {
+                        'description': rng.choice(ITEM_DESCRIPTIONS),
+                        'quantity': str(Decimal(rng.randrange(1, 500))),
+                        'unit_price': str(Decimal(rng.randrange(1000, 50000))),
+                    }
+                    for _ in range(options['items_per_invoice'])
+                ],
+            })
+        for start in range(0, len(records), 500):
+            ingest_invoices(records[start:start + 500])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['employees']} employees and {options['invoices']} invoices; "
+            f"log in as '{options['username']}'."
+        ))
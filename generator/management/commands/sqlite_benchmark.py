@@ -0,0 +1,147 @@
+# generator/management/commands/sqlite_benchmark.py
+
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from generator import sqlite
+from generator.loadtest import percentile
+
+SCHEMA = (
+    'CREATE TABLE invoice (id INTEGER PRIMARY KEY, invoice_number TEXT UNIQUE, client_name TEXT, issue_date TEXT)',
+    'CREATE INDEX invoice_issue_date ON invoice (issue_date)',
+    'CREATE TABLE invoice_item (id INTEGER PRIMARY KEY, invoice_id INTEGER REFERENCES invoice (id), '
+    'description TEXT, quantity NUMERIC, unit_price NUMERIC)',
+    'CREATE INDEX invoice_item_invoice ON invoice_item (invoice_id)',
+)
+# The invoice dashboard's query shape: the latest invoices with their totals.
+DASHBOARD_QUERY = (
+    'SELECT i.id, i.invoice_number, i.client_name, COUNT(t.id), SUM(t.quantity * t.unit_price) '
+    'FROM (SELECT * FROM invoice WHERE issue_date <= ? ORDER BY issue_date DESC LIMIT 25) i '
+    'LEFT JOIN invoice_item t ON t.invoice_id = i.id GROUP BY i.id ORDER BY i.issue_date DESC'
+)
+# SQLite's defaults, set explicitly because journal_mode persists in the file.
+DEFAULT_PRAGMAS = ('PRAGMA journal_mode=DELETE', 'PRAGMA synchronous=FULL')
+ITEMS_PER_INVOICE = 5
+
+
+def _connect(path, pragmas):
+    # timeout=5 matches Django's SQLite backend; isolation_level='' gives the
+    # same deferred BEGIN before each write.
+    connection = sqlite3.connect(path, timeout=5, isolation_level='')
+    sqlite.apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def _seed(path, invoices):
+    connection = sqlite3.connect(path)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    rng = random.Random(1)
+    with connection:
+        for number in range(1, invoices + 1):
+            _insert_invoice(connection, f'SEED-{number}', rng)
+    connection.close()
+
+
+def _insert_invoice(connection, invoice_number, rng):
+    cursor = connection.execute(
+        'INSERT INTO invoice (invoice_number, client_name, issue_date) VALUES (?, ?, ?)',
+        (invoice_number, f'Client {rng.randrange(500)}', f'2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}'),
+    )
+    connection.executemany(
+        'INSERT INTO invoice_item (invoice_id, description, quantity, unit_price) VALUES (?, ?, ?, ?)',
+        [(cursor.lastrowid, f'Item {line}', rng.randrange(1, 50), rng.randrange(1000, 90000))
+         for line in range(ITEMS_PER_INVOICE)],
+    )
+
+
+def _reader(path, pragmas, deadline, results):
+    connection = _connect(path, pragmas)
+    rng = random.Random(os.getpid())
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.execute(DASHBOARD_QUERY, (f'2025-{rng.randrange(1, 13):02d}-28',)).fetchall()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', latencies, errors))
+
+
+def _writer(path, pragmas, deadline, results):
+    connection = _connect(path, pragmas)
+    rng = random.Random(os.getpid())
+    latencies, errors = [], 0
+    number = 0
+    while time.monotonic() < deadline:
+        number += 1
+        started = time.perf_counter()
+        try:
+            with connection:
+                _insert_invoice(connection, f'W{os.getpid()}-{number}', rng)
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('write', latencies, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares concurrent dashboard reads and invoice writes on a scratch SQLite database "
+        "with SQLite's default settings and with the performance mode of generator/sqlite.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help="Reader processes.")
+        parser.add_argument('--writers', type=int, default=2, help="Writer processes.")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds per mode.")
+        parser.add_argument('--invoices', type=int, default=5000, help="Invoices seeded before each run.")
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        directory = tempfile.mkdtemp(prefix='dms-sqlite-benchmark-')
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, {options['duration']:.0f}s per mode, "
+            f"{options['invoices']} seeded invoices x {ITEMS_PER_INVOICE} items."
+        )
+        self.stdout.write(f"{'mode':<12}{'reads/s':>10}{'read p95 ms':>13}{'writes/s':>10}"
+                          f"{'write p95 ms':>14}{'lock errors':>13}")
+        try:
+            for mode, pragmas in (('default', DEFAULT_PRAGMAS), ('performance', sqlite.PERFORMANCE_PRAGMAS)):
+                path = os.path.join(directory, f'{mode}.sqlite3')
+                _seed(path, options['invoices'])
+                _connect(path, pragmas).close()
+                results = context.Queue()
+                deadline = time.monotonic() + options['duration']
+                workers = [
+                    context.Process(target=_reader, args=(path, pragmas, deadline, results))
+                    for _ in range(options['readers'])
+                ] + [
+                    context.Process(target=_writer, args=(path, pragmas, deadline, results))
+                    for _ in range(options['writers'])
+                ]
+                for worker in workers:
+                    worker.start()
+                collected = {'read': ([], 0), 'write': ([], 0)}
+                for _ in workers:
+                    kind, latencies, errors = results.get()
+                    collected[kind] = (collected[kind][0] + latencies, collected[kind][1] + errors)
+                for worker in workers:
+                    worker.join()
+                reads, read_errors = collected['read']
+                writes, write_errors = collected['write']
+                reads.sort()
+                writes.sort()
+                self.stdout.write(
+                    f"{mode:<12}{len(reads) / options['duration']:>10.0f}{percentile(reads, 95) * 1000:>13.1f}"
+                    f"{len(writes) / options['duration']:>10.0f}{percentile(writes, 95) * 1000:>14.1f}"
+                    f"{read_errors + write_errors:>13}"
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
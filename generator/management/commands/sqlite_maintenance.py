@@ -0,0 +1,36 @@
+# generator/management/commands/sqlite_maintenance.py
+
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from generator import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs PRAGMA optimize and a WAL checkpoint (TRUNCATE by default) on a SQLite database. "
+        "The web workers run a PASSIVE checkpoint every SQLITE_MAINTENANCE_INTERVAL seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias.")
+        parser.add_argument(
+            '--checkpoint', default='TRUNCATE', choices=sqlite.CHECKPOINT_MODES,
+            help="WAL checkpoint mode; TRUNCATE waits for writers and empties the WAL file.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"'{options['database']}' is not a SQLite database.")
+        wal_path = f"{connection.settings_dict['NAME']}-wal"
+        before = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            log_frames, checkpointed = sqlite.run_maintenance(cursor, options['checkpoint'])
+        after = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"journal_mode={journal_mode}; checkpointed {checkpointed} of {log_frames} WAL frames; "
+            f"WAL file {before / 1024:.0f} KiB -> {after / 1024:.0f} KiB."
+        ))
@@ -0,0 +1,36 @@
+# generator/management/commands/sync_sqlite_replica.py
+
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from generator import routers
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database into the SQLite replica (DATABASE_REPLICA_URL), "
+        "for trying read-replica routing locally. Real replicas are kept in sync by the database server."
+    )
+
+    def handle(self, *args, **options):
+        if routers.REPLICA is None:
+            raise CommandError("No replica configured; set DATABASE_REPLICA_URL.")
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[routers.REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("Both the primary and the replica must be SQLite databases.")
+        source_path, target_path = primary.settings_dict['NAME'], replica.settings_dict['NAME']
+        if str(source_path) == str(target_path):
+            raise CommandError("The primary and the replica are the same file.")
+        started = time.perf_counter()
+        # The backup API copies a consistent snapshot while others keep writing.
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Copied {source_path} to {target_path} in {time.perf_counter() - started:.1f}s."
+        ))
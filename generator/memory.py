@@ -0,0 +1,263 @@
+# generator/memory.py
+
+import functools
+import gc
+import json
+import linecache
+import logging
+import os
+import signal
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# RENDER MEMORY PROFILING AND WORKER RECYCLING
+# ==============================================================================
+# Every pdf_utils generator is wrapped with @track_render. After each render
+# the worker's current RSS is sampled, which costs one read of
+# /proc/self/statm:
+#
+# - Growth: the RSS floor (the smallest sample among the last
+#   RENDER_MEMORY_WINDOW renders) ignores the spike of one large batch but
+#   rises with memory that is never given back. Once the floor is more than
+#   RENDER_WORKER_MAX_GROWTH_MB above the floor of the first window, a
+#   gunicorn worker sends itself SIGTERM: gunicorn finishes the requests in
+#   flight and the master starts a fresh worker. Other processes only log it.
+# - Profiling (RENDER_MEMORY_PROFILING, off by default since tracemalloc slows
+#   Python allocation down noticeably): each render also records the traced
+#   memory it allocated at its peak and still held on return, per generator.
+#   A tracemalloc snapshot taken after the first window is the baseline;
+#   every RENDER_MEMORY_SNAPSHOT_EVERY renders the current heap is compared
+#   with it and the call paths that grew the most are kept.
+#
+# Each worker writes what it has seen to RENDER_MEMORY_REPORT_DIR as
+# worker-<pid>.json; `manage.py memory_report` combines them. Renders running
+# in parallel threads of one worker share its heap, so per-render figures are
+# approximate under gthread; the growth sites are not affected.
+
+PROFILING = getattr(settings, 'RENDER_MEMORY_PROFILING', False)
+FRAMES = getattr(settings, 'RENDER_MEMORY_FRAMES', 10)
+SNAPSHOT_EVERY = getattr(settings, 'RENDER_MEMORY_SNAPSHOT_EVERY', 100)
+WINDOW = getattr(settings, 'RENDER_MEMORY_WINDOW', 50)
+MAX_GROWTH_MB = getattr(settings, 'RENDER_WORKER_MAX_GROWTH_MB', 256)
+REPORT_DIR = getattr(settings, 'RENDER_MEMORY_REPORT_DIR', os.path.join(tempfile.gettempdir(), 'dms-memory'))
+TOP_SITES = 15
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """
+    Resident set size of this process right now, in bytes (0 if unknown).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class RenderMemory:
+    """
+    Per-process render counters, RSS history and tracemalloc growth sites.
+    """
+
+    def __init__(self, profiling=PROFILING, window=WINDOW, snapshot_every=SNAPSHOT_EVERY,
+                 max_growth_mb=MAX_GROWTH_MB):
+        self.profiling = profiling
+        self.window = window
+        self.snapshot_every = snapshot_every
+        self.max_growth = max_growth_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.renders = 0
+        self.generators = {}
+        self.samples = deque(maxlen=window)
+        self.baseline_floor = None
+        self.baseline_snapshot = None
+        self.growth_sites = []
+        self.recycle = False
+        self.recycling = False
+
+    def start(self):
+        if self.profiling and not tracemalloc.is_tracing():
+            tracemalloc.start(FRAMES)
+        if self.profiling:
+            tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+        return None
+
+    def finish(self, name, started, traced_before):
+        entry = {'seconds': time.perf_counter() - started}
+        if traced_before is not None:
+            traced, peak = tracemalloc.get_traced_memory()
+            entry['retained'] = traced - traced_before
+            entry['peak'] = peak - traced_before
+        rss = current_rss()
+        with self.lock:
+            self.renders += 1
+            stats = self.generators.setdefault(name, {
+                'renders': 0, 'seconds': 0.0, 'retained': 0, 'max_peak': 0,
+            })
+            stats['renders'] += 1
+            stats['seconds'] += entry['seconds']
+            if 'retained' in entry:
+                stats['retained'] += entry['retained']
+                stats['max_peak'] = max(stats['max_peak'], entry['peak'])
+            self.samples.append(rss)
+            count = self.renders
+        if count == self.window:
+            self._set_baseline()
+        elif self.profiling and self.baseline_snapshot is not None and count % self.snapshot_every == 0:
+            self.compare_snapshot()
+        self._check_growth(count)
+        if count % self.snapshot_every == 0 or count == self.window:
+            self.write_report()
+
+    def floor(self):
+        return min(self.samples) if self.samples else 0
+
+    def _set_baseline(self):
+        # The first window includes one-time costs (imports, compiled
+        # layouts, fonts), so it is the reference rather than process start.
+        self.baseline_floor = self.floor()
+        if self.profiling:
+            gc.collect()
+            self.baseline_snapshot = _snapshot()
+
+    def compare_snapshot(self):
+        gc.collect()
+        differences = _snapshot().compare_to(self.baseline_snapshot, 'traceback')
+        self.growth_sites = [
+            {
+                'size_diff': difference.size_diff,
+                'count_diff': difference.count_diff,
+                'size': difference.size,
+                'traceback': _format_traceback(difference.traceback),
+            }
+            for difference in differences[:TOP_SITES] if difference.size_diff > 0
+        ]
+
+    def growth(self):
+        if self.baseline_floor is None or len(self.samples) < self.window:
+            return 0
+        return self.floor() - self.baseline_floor
+
+    def _check_growth(self, count):
+        growth = self.growth()
+        if not self.max_growth or growth <= self.max_growth or self.recycling:
+            return
+        self.recycling = True
+        logger.warning(
+            "Render memory: RSS floor grew %.0f MiB over %d renders (limit %.0f MiB).",
+            growth / 1048576, count, self.max_growth / 1048576,
+        )
+        self.write_report()
+        if self.recycle:
+            logger.warning("Render memory: recycling worker %d.", os.getpid())
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def report(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'written_at': time.time(),
+                'profiling': self.profiling,
+                'renders': self.renders,
+                'rss': self.samples[-1] if self.samples else current_rss(),
+                'rss_floor': self.floor(),
+                'baseline_floor': self.baseline_floor,
+                'growth': self.growth(),
+                'recycling': self.recycling,
+                'generators': {name: dict(stats) for name, stats in self.generators.items()},
+                'growth_sites': list(self.growth_sites),
+            }
+
+    def write_report(self):
+        try:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            path = os.path.join(REPORT_DIR, f'worker-{os.getpid()}.json')
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w') as report_file:
+                json.dump(self.report(), report_file)
+            os.replace(temporary, path)
+        except OSError:
+            logger.exception("Render memory: could not write the report.")
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, linecache.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
+
+
+def _format_traceback(traceback):
+    # Innermost frame last, as in a Python traceback.
+    return [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+
+
+tracker = RenderMemory()
+
+
+def reset(**options):
+    """
+    Replaces this process's tracker with a fresh one built with `options`.
+    """
+    global tracker
+    tracker = RenderMemory(**options)
+    return tracker
+
+
+def enable_worker_recycling():
+    """
+    Called in each gunicorn worker once it has loaded the app: lets sustained
+    growth end the worker gracefully, and starts it with a clean history.
+    """
+    reset().recycle = True
+
+
+def read_reports():
+    """
+    The latest report of every worker that has written one.
+    """
+    reports = []
+    if not os.path.isdir(REPORT_DIR):
+        return reports
+    for name in sorted(os.listdir(REPORT_DIR)):
+        if name.startswith('worker-') and name.endswith('.json'):
+            try:
+                with open(os.path.join(REPORT_DIR, name)) as report_file:
+                    reports.append(json.load(report_file))
+            except (OSError, ValueError):
+                continue
+    return reports
+
+
+def track_render(function):
+    """
+    Measures each call of a pdf_utils generator. Nested tracked calls (the
+    single-document generators delegate to the batch ones) count once.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        local = tracker.local
+        if getattr(local, 'active', False):
+            return function(*args, **kwargs)
+        local.active = True
+        try:
+            traced_before = tracker.start()
+            started = time.perf_counter()
+            result = function(*args, **kwargs)
+        finally:
+            local.active = False
+        tracker.finish(function.__name__, started, traced_before)
+        return result
+    return wrapper
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.24 on 2026-10-19 09:00
+
+from django.db import migrations
+
+# The search index lives outside the ORM (an FTS5 virtual table on SQLite, a
+# tsvector side table on PostgreSQL), so it is created with raw SQL for the
+# active backend only. Other backends fall back to icontains at query time.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS generator_invoice_fts USING fts5(
+        client_name, client_address, other_comments, items,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO generator_invoice_fts (rowid, client_name, client_address, other_comments, items)
+    SELECT i.id, i.client_name, i.client_address, COALESCE(i.other_comments, ''),
+           COALESCE((SELECT group_concat(it.description, char(10))
+                     FROM generator_invoiceitem it WHERE it.invoice_id = i.id), '')
+    FROM generator_invoice i
+    """,
+]
+SQLITE_REVERSE = ["DROP TABLE IF EXISTS generator_invoice_fts"]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE IF NOT EXISTS generator_invoice_search (
+        invoice_id bigint PRIMARY KEY REFERENCES generator_invoice (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        body text NOT NULL,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS generator_invoice_search_document_gin ON generator_invoice_search USING GIN (document)",
+    """
+    INSERT INTO generator_invoice_search (invoice_id, body, document)
+    SELECT i.id,
+           concat_ws(' ', i.client_name, i.client_address, items.text, i.other_comments),
+           setweight(to_tsvector('english', coalesce(i.client_name, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(i.client_address, '')), 'B') ||
+           setweight(to_tsvector('english', coalesce(items.text, '')), 'C') ||
+           setweight(to_tsvector('english', coalesce(i.other_comments, '')), 'D')
+    FROM generator_invoice i
+    LEFT JOIN (
+        SELECT invoice_id, string_agg(description, E'\\n' ORDER BY id) AS text
+        FROM generator_invoiceitem GROUP BY invoice_id
+    ) items ON items.invoice_id = i.id
+    """,
+]
+POSTGRES_REVERSE = ["DROP TABLE IF EXISTS generator_invoice_search"]
+
+
+def _run(schema_editor, statements_by_vendor):
+    for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0003_alter_invoice_invoice_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
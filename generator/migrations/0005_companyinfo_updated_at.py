@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0004_invoice_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='companyinfo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0005_companyinfo_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='issue_date',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.24 on 2026-10-19 05:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# Existing rows get one entry each, so a consumer starting from an empty
+# cursor receives the whole data set once and only changes after that.
+BACKFILL = (
+    ('employee', 'Employee'),
+    ('business_card', 'BusinessCard'),
+    ('invoice', 'Invoice'),
+    ('invoice_item', 'InvoiceItem'),
+)
+
+
+def backfill_changes(apps, schema_editor):
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    change_table = apps.get_model('generator', 'Change')._meta.db_table
+    now = connection.ops.adapt_datetimefield_value(django.utils.timezone.now())
+    with connection.cursor() as cursor:
+        for name, model_name in BACKFILL:
+            table = apps.get_model('generator', model_name)._meta.db_table
+            cursor.execute(
+                f"INSERT INTO {quote(change_table)} (model, object_id, deleted, changed_at) "
+                f"SELECT %s, id, %s, %s FROM {quote(table)} ORDER BY id",
+                [name, False, now],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0006_invoice_issue_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=32)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id'], name='generator_c_model_268283_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
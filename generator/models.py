@@ -2,12 +2,24 @@
 
 from django.db import models
 from django.utils import timezone
-import qrcode
 from io import BytesIO
 from django.core.files.base import ContentFile
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill, SmartResize
 
+
+def make_qr_code_png(data):
+    """
+    Renders `data` as a QR code and returns the PNG bytes.
+    """
+    # qrcode is only needed when a code is generated, so it is imported here
+    # rather than on every model import (workers, migrations, commands).
+    import qrcode
+    qr_image = qrcode.make(data)
+    buffer = BytesIO()
+    qr_image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
 # ==============================================================================
 # COMPANY AND EMPLOYEE MODELS
 # ==============================================================================
@@ -36,6 +48,8 @@ class CompanyInfo(models.Model):
     instagram_url = models.URLField("Instagram URL", blank=True, null=True)
     facebook_url = models.URLField("Facebook URL", blank=True, null=True)
     qr_code = models.ImageField(upload_to='company_qr_codes/', blank=True, editable=False)
+    # Bumped on every save; compiled document layouts are cached per value.
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Thumbnail for automatic resizing
     logo_thumbnail = ImageSpecField(source='logo', processors=[SmartResize(100, 100)], format='PNG', options={'quality': 95})
@@ -45,11 +59,8 @@ class CompanyInfo(models.Model):
 
     def save(self, *args, **kwargs):
         if self.pk and self.website and not self.qr_code:
-            qr_image = qrcode.make(self.website)
-            buffer = BytesIO()
-            qr_image.save(buffer, format='PNG')
             file_name = f'company_qr_{self.pk}.png'
-            self.qr_code.save(file_name, ContentFile(buffer.getvalue()), save=False)
+            self.qr_code.save(file_name, ContentFile(make_qr_code_png(self.website)), save=False)
         super().save(*args, **kwargs)
 
     class Meta:
@@ -67,6 +78,8 @@ class Employee(models.Model):
     employee_id = models.CharField(max_length=100, unique=True, blank=True, editable=False)
     qr_code = models.ImageField(upload_to='employee_qr_codes/', blank=True, editable=False)
     photo_thumbnail = ImageSpecField(source='photo', processors=[ResizeToFill(200, 200)], format='JPEG', options={'quality': 90})
+    # The ID card photo is 25 mm square; 300 px is 300 DPI at that size.
+    photo_print = ImageSpecField(source='photo', processors=[ResizeToFill(300, 300)], format='JPEG', options={'quality': 90})
     issue_date = models.DateField(auto_now_add=True)
 
     def __str__(self):
@@ -84,16 +97,23 @@ class Employee(models.Model):
             self.employee_id = f"{department_code}{year}-{self.pk}"
             fields_to_update.append('employee_id')
         if should_generate_qr:
-            qr_data = f"Name: {self.full_name}\nID: {self.employee_id}\nTitle: {self.job_title}"
-            qr_image = qrcode.make(qr_data)
-            buffer = BytesIO()
-            qr_image.save(buffer, format='PNG')
-            file_name = f'qr_code_{self.pk}.png'
-            self.qr_code.save(file_name, ContentFile(buffer.getvalue()), save=False)
+            self.regenerate_qr_code()
             fields_to_update.append('qr_code')
         if fields_to_update:
             super().save(update_fields=fields_to_update)
 
+    def regenerate_qr_code(self):
+        """
+        Re-renders the QR code from the current name, ID and title, replacing
+        the old image file. Only the file is written; the caller saves the
+        `qr_code` field.
+        """
+        if self.qr_code:
+            self.qr_code.delete(save=False)
+        qr_data = f"Name: {self.full_name}\nID: {self.employee_id}\nTitle: {self.job_title}"
+        file_name = f'qr_code_{self.pk}.png'
+        self.qr_code.save(file_name, ContentFile(make_qr_code_png(qr_data)), save=False)
+
 
 class BusinessCard(models.Model):
     """
@@ -116,7 +136,7 @@ class BusinessCard(models.Model):
 class Invoice(models.Model):
     # The invoice_number field can now be non-editable as it's auto-generated
     invoice_number = models.CharField(max_length=100, unique=True, blank=True, editable=False)
-    issue_date = models.DateTimeField()
+    issue_date = models.DateTimeField(db_index=True)
     due_date = models.DateTimeField(blank=True, null=True)
     client_name = models.CharField(max_length=255)
     client_address = models.TextField()
@@ -134,23 +154,22 @@ class Invoice(models.Model):
     def get_total_quantity(self):
         return sum(item.quantity for item in self.items.all())
 
+    @classmethod
+    def allocate_invoice_numbers(cls, count, using=None):
+        """
+        Returns `count` consecutive invoice numbers following the highest
+        existing invoice ID, formatted with the "INV" prefix and leading zeros.
+        """
+        last_id = cls.objects.using(using).aggregate(last_id=models.Max('id'))['last_id'] or 0
+        return [f'INV-{last_id + offset:04d}' for offset in range(1, count + 1)]
+
     # =======================================================
     # THIS IS THE FIX: The new, automated save method
     # =======================================================
     def save(self, *args, **kwargs):
         # This logic runs only when a new invoice is being created
         if not self.invoice_number:
-            # Find the highest existing invoice number
-            last_invoice = Invoice.objects.all().order_by('id').last()
-            if not last_invoice:
-                # This is the very first invoice
-                new_number = 1
-            else:
-                # Get the number from the last invoice's ID and add 1
-                new_number = last_invoice.id + 1
-            
-            # Format the number with the "INV" prefix and leading zeros
-            self.invoice_number = f'INV-{new_number:04d}'
+            self.invoice_number = Invoice.allocate_invoice_numbers(1, using=kwargs.get('using'))[0]
         
         # Call the original save method to save the instance
         super().save(*args, **kwargs)
@@ -169,4 +188,26 @@ class InvoiceItem(models.Model):
         return self.description
 
     def get_total(self):
-        return self.quantity * self.unit_price
\ No newline at end of file
+        return self.quantity * self.unit_price
+
+
+# ==============================================================================
+# CHANGE FEED
+# ==============================================================================
+
+class Change(models.Model):
+    """
+    The latest change to one synced row, for the change-feed API. The id is
+    the feed's sequence number: each save or delete replaces the row's entry
+    with a new one, so an entry's id only ever grows.
+    """
+    model = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"#{self.pk} {'delete' if self.deleted else 'save'} {self.model} {self.object_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['model', 'object_id'])]
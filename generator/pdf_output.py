@@ -0,0 +1,53 @@
+# generator/pdf_output.py
+
+import logging
+import resource
+import tempfile
+from django.conf import settings
+from django.http import FileResponse
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# PDF OUTPUT FILES AND RESPONSES
+# ==============================================================================
+# ReportLab keeps a document in memory until Canvas.save() and then writes it
+# out in one go, so pages cannot be sent before the document is finished.
+# What can be bounded is what happens after that: documents are written to a
+# spooled temporary file that moves to disk once it outgrows
+# PDF_SPOOL_MAX_MEMORY, and the response streams it from there in blocks. A
+# worker then holds at most one spool's worth of each PDF while slow clients
+# download it, instead of every finished document in full.
+
+SPOOL_MAX_MEMORY = getattr(settings, 'PDF_SPOOL_MAX_MEMORY', 512 * 1024)
+
+
+def new_output():
+    """
+    A binary file for one rendered document.
+    """
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode='w+b')
+
+
+def peak_rss_kib():
+    """
+    Peak resident set size of this process so far, in KiB (Linux units).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def pdf_response(output, filename):
+    """
+    Streams a rendered document as an attachment. The file is closed (and
+    any spilled temporary file removed) once the response has been sent.
+    """
+    size = output.seek(0, 2)
+    output.seek(0)
+    # A spool moves to disk once it grows past its limit; shared renders (see
+    # coalesce.py) are plain files on disk.
+    on_disk = not isinstance(output, tempfile.SpooledTemporaryFile) or size > SPOOL_MAX_MEMORY
+    logger.info(
+        "PDF %s: %d bytes, %s, peak RSS %d KiB",
+        filename, size, 'on disk' if on_disk else 'in memory', peak_rss_kib(),
+    )
+    return FileResponse(output, as_attachment=True, filename=filename, content_type='application/pdf')
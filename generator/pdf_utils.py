@@ -1,15 +1,60 @@
 # generator/pdf_utils.py
 
-import io
-from django.conf import settings
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
+from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm, inch
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.colors import HexColor, black, white
+from reportlab.lib.colors import HexColor, black
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.platypus import Paragraph, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
 from django.contrib.humanize.templatetags.humanize import intcomma
+from .layouts import get_face, register_block
+from .memory import track_render
+from .models import BusinessCard
+from .pdf_output import new_output
+
+# All drawing is driven by the JSON layouts in generator/document_layouts/,
+# compiled once per layout and company version (see generator/layouts.py).
+# Every function takes an optional `layout` naming a variant of the default.
+# Generators return a spooled file positioned at the start (see pdf_output.py).
+
+# ==============================================================================
+# REUSABLE PDF FORMS
+# ==============================================================================
+class ComponentCache:
+    """
+    Renders reusable document components once per canvas as PDF form XObjects.
+
+    A component is drawn the first time its (kind, key) is requested and every
+    later request only places the stored form, so content shared by many pages
+    (the invoice, the company layers of each card) is written to the PDF once.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self._forms = {}
+
+    def place(self, kind, key, draw, x, y, width, height):
+        name = self._forms.get((kind, key))
+        if name is None:
+            name = f"{kind}_{len(self._forms)}"
+            self.p.beginForm(name, 0, 0, width, height)
+            draw(self.p)
+            self.p.endForm()
+            self._forms[(kind, key)] = name
+        self.p.saveState()
+        self.p.translate(x, y)
+        self.p.doForm(name)
+        self.p.restoreState()
+
+
+def draw_face(p, cache, face, context, x=0, y=0):
+    """
+    Draws a compiled layout face with its company-only layer placed from
+    `cache`, so batch documents store that layer once.
+    """
+    cache.place('face', face, face.draw_static, x, y, face.width, face.height)
+    face.draw_dynamic(p, context, x, y)
+
 
 # ==============================================================================
 # ID CARD PDF GENERATION UTILITY
@@ -17,259 +62,289 @@ from django.contrib.humanize.templatetags.humanize import intcomma
 CARD_WIDTH_MM = 85.6
 CARD_HEIGHT_MM = 54
 
-def generate_id_card_pdf(employee, company_info):
-    buffer = io.BytesIO()
+@track_render
+def generate_id_card_pdf(employee, company_info, layout=None):
+    return generate_id_cards_pdf([employee], company_info, layout)
+
+@track_render
+def generate_id_cards_pdf(employees, company_info, layout=None):
+    """
+    Generates one PDF with a page per employee holding the front and back of
+    their ID card.
+    """
+    buffer = new_output()
     p = canvas.Canvas(buffer, pagesize=(CARD_WIDTH_MM * mm, (CARD_HEIGHT_MM * 2 + 20) * mm))
-    draw_card_front(p, employee, company_info, y_offset=(CARD_HEIGHT_MM + 10) * mm)
-    draw_card_back(p, employee, company_info, y_offset=5 * mm)
-    p.showPage()
+    cache = ComponentCache(p)
+    front = get_face('id_card', 'front', company_info, layout)
+    back = get_face('id_card', 'back', company_info, layout)
+    for employee in employees:
+        context = {'employee': employee}
+        draw_face(p, cache, front, context, y=(CARD_HEIGHT_MM + 10) * mm)
+        draw_face(p, cache, back, context, y=5 * mm)
+        p.showPage()
     p.save()
     buffer.seek(0)
     return buffer
 
-def draw_card_front(p, employee, company_info, y_offset):
-    # This function is correct and remains as is
-    red = HexColor('#C0392B')
-    gold = HexColor('#D4AF37')
-    dark_blue = HexColor('#1A2C42')
-    p.setFillColor(red)
-    p.rect(0, y_offset, (CARD_WIDTH_MM * 0.35) * mm, CARD_HEIGHT_MM * mm, fill=1, stroke=0)
-    p.setFillColorRGB(1, 1, 1)
-    p.rect((CARD_WIDTH_MM * 0.35) * mm, y_offset, (CARD_WIDTH_MM * 0.65) * mm, CARD_HEIGHT_MM * mm, fill=1, stroke=0)
-    if company_info and company_info.logo_thumbnail:
-        logo_path = settings.MEDIA_ROOT / company_info.logo_thumbnail.name
-        try: p.drawImage(logo_path, 5*mm, y_offset + 35*mm, width=20*mm, height=20*mm, preserveAspectRatio=True, mask='auto')
-        except: pass
-    p.setFillColorRGB(1, 1, 1)
-    p.setFont("Helvetica-Bold", 8)
-    p.saveState()
-    p.rotate(90)
-    p.drawString(y_offset + 10*mm, -15*mm, f"ID: {employee.employee_id}")
-    p.restoreState()
-    p.setFillColor(dark_blue)
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString((CARD_WIDTH_MM * 0.35 + 5) * mm, y_offset + 45 * mm, employee.full_name)
-    p.setFont("Helvetica", 8)
-    p.drawString((CARD_WIDTH_MM * 0.35 + 5) * mm, y_offset + 40 * mm, employee.job_title)
-    if employee.photo_thumbnail:
-        photo_path = settings.MEDIA_ROOT / employee.photo_thumbnail.name
-        try: p.drawImage(photo_path, (CARD_WIDTH_MM * 0.35 + 5) * mm, y_offset + 10 * mm, width=25*mm, height=25*mm, preserveAspectRatio=True)
-        except: pass
-    p.setStrokeColor(gold)
-    p.setLineWidth(1.5)
-    p.rect((CARD_WIDTH_MM * 0.35 + 4) * mm, y_offset + 9 * mm, 27*mm, 27*mm, fill=0, stroke=1)
-    
-def draw_card_back(p, employee, company_info, y_offset):
-    # This function is correct and remains as is
-    gold = HexColor('#D4AF37')
-    dark_blue = HexColor('#1A2C42')
-    p.setFillColorRGB(1, 1, 1)
-    p.rect(0, y_offset, CARD_WIDTH_MM * mm, CARD_HEIGHT_MM * mm, fill=1, stroke=0)
-    p.setFillColor(gold)
-    p.rect(0, y_offset + (CARD_HEIGHT_MM - 2) * mm, CARD_WIDTH_MM * mm, 2 * mm, fill=1, stroke=0)
-    p.setFillColor(dark_blue)
-    p.setFont("Helvetica-Bold", 9)
-    p.drawCentredString(CARD_WIDTH_MM * mm / 2, y_offset + 45 * mm, company_info.name)
-    if employee.qr_code:
-        qr_path = settings.MEDIA_ROOT / employee.qr_code.name
-        try: p.drawImage(qr_path, (CARD_WIDTH_MM * mm / 2 - 12.5*mm), y_offset + 18 * mm, width=25*mm, height=25*mm, preserveAspectRatio=True)
-        except: pass
-    p.setFont("Helvetica", 6)
-    text = p.beginText((CARD_WIDTH_MM * mm / 2), y_offset + 12 * mm)
-    text.textAlignment = 1
-    text.textLine(company_info.address or "")
-    text.textLine(f"Phone: {company_info.phone or 'N/A'}")
-    text.textLine(f"Email: {company_info.email or 'N/A'}")
-    p.drawText(text)
-    p.setFont("Helvetica-Oblique", 5)
-    p.drawCentredString(CARD_WIDTH_MM * mm / 2, y_offset + 2 * mm, "This card is property of the company. If found, please return it.")
+def draw_card_front(p, employee, company_info, y_offset, layout=None):
+    get_face('id_card', 'front', company_info, layout).draw(p, {'employee': employee}, y=y_offset)
+
+
+# ==============================================================================
+# BUSINESS CARD PDF DRAWING
+# ==============================================================================
+# The default layout mirrors business_card_print.html: a white front with the
+# employee's details and a dark back with the company block and QR code.
+BUSINESS_CARD_WIDTH = 3.5 * inch
+BUSINESS_CARD_HEIGHT = 2 * inch
+
+BUSINESS_CARD_ROWS_PER_PAGE = 5
+BUSINESS_CARD_GAP = 0.15 * inch
+
+@track_render
+def generate_business_cards_pdf(employees, company_info, layout=None):
+    """
+    Generates A4 print sheets of business cards: five employees per page,
+    each row holding the front of the card on the left and its back on the
+    right.
+    """
+    buffer = new_output()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    cache = ComponentCache(p)
+    front = get_face('business_card', 'front', company_info, layout)
+    back = get_face('business_card', 'back', company_info, layout)
+    width, height = A4
+    left_x = (width - 2 * BUSINESS_CARD_WIDTH - BUSINESS_CARD_GAP) / 2
+    rows_height = BUSINESS_CARD_ROWS_PER_PAGE * (BUSINESS_CARD_HEIGHT + BUSINESS_CARD_GAP) - BUSINESS_CARD_GAP
+    top = height - (height - rows_height) / 2
+    row = 0
+    for employee in employees:
+        if row == BUSINESS_CARD_ROWS_PER_PAGE:
+            p.showPage()
+            row = 0
+        y = top - (row + 1) * BUSINESS_CARD_HEIGHT - row * BUSINESS_CARD_GAP
+        context = {'employee': employee, 'card': _business_card_for(employee)}
+        draw_face(p, cache, front, context, left_x, y)
+        draw_face(p, cache, back, context, left_x + BUSINESS_CARD_WIDTH + BUSINESS_CARD_GAP, y)
+        row += 1
+    p.showPage()
+    p.save()
+    buffer.seek(0)
+    return buffer
 
 
 # ==============================================================================
 # FINAL, HIGH-FIDELITY INVOICE PDF GENERATION UTILITY
 # ==============================================================================
-def generate_invoice_pdf(invoice, company_info):
-    buffer = io.BytesIO()
-    # Use A4 paper size, which is standard for invoices
-    p = canvas.Canvas(buffer, pagesize='A4')
-    width, height = letter # Use letter dimensions for inch calculations
-    styles = getSampleStyleSheet()
-    styles['Normal'].fontName = 'Helvetica'
-    styles['Normal'].fontSize = 9
-    styles['Normal'].leading = 12
-
-    # --- Define Brand Colors ---
-    hc_red = HexColor('#C0392B')
-    hc_gold = HexColor('#D4AF37')
-    hc_dark = HexColor('#2C3E50')
-
-    # --- 1. Header Section ---
-    if company_info and company_info.logo:
-        try:
-            logo_path = settings.MEDIA_ROOT / company_info.logo.name
-            p.drawImage(logo_path, 1*inch, height - 1.25*inch, width=0.8*inch, preserveAspectRatio=True, mask='auto')
-        except: pass
-    
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(1*inch, height - 1.5*inch, (company_info.name or "").upper())
-    p.setFont("Helvetica", 9)
-    p.drawString(1*inch, height - 1.7*inch, f"P.O.BOX {company_info.address or 'N/A'}, Dodoma")
-    p.drawString(1*inch, height - 1.85*inch, company_info.phone or "N/A")
-    p.setFillColor(HexColor('#0000FF'))
-    p.drawString(1*inch, height - 2.0*inch, company_info.email or "N/A")
-    p.setFillColor(black)
+# Styles shared by every invoice, built once at import instead of per render.
+HC_DARK = HexColor('#2C3E50')
+HC_GOLD = HexColor('#D4AF37')
 
-    p.setFont("Helvetica-Bold", 28)
-    p.setFillColor(hc_red)
-    p.drawRightString(width - 1*inch, height - 1.0*inch, "INVOICE")
-    p.setFillColor(black)
-    p.setFont("Helvetica", 9)
-    p.drawRightString(width - 1*inch, height - 1.25*inch, f"Please Remitt to: {company_info.bank_name or 'N/A'}")
-    p.drawRightString(width - 1*inch, height - 1.40*inch, f"A/C NO: {company_info.account_number or 'N/A'}")
-    p.drawRightString(width - 1*inch, height - 1.55*inch, f"A/C NAME: {company_info.account_name or 'N/A'}")
-    
-    # Gold Separator Line
-    p.setStrokeColor(hc_gold)
-    p.setLineWidth(2)
-    p.line(1*inch, height - 2.2*inch, width - 1*inch, height - 2.2*inch)
+INVOICE_TEXT_STYLE = ParagraphStyle(
+    'InvoiceText', parent=getSampleStyleSheet()['Normal'],
+    fontName='Helvetica', fontSize=9, leading=12,
+)
 
-    # --- 2. Info Grid Section ---
-    p.setFillColor(hc_dark)
-    p.rect(1*inch, height - 2.8*inch, 1*inch, 0.2*inch, fill=1, stroke=0)
-    p.setFillColorRGB(1,1,1) # White text
-    p.setFont("Helvetica-Bold", 10)
-    p.drawString(1.1*inch, height - 2.75*inch, "BILL TO")
-    p.setFillColor(black)
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(1*inch, height - 3.1*inch, invoice.client_name.upper())
-    p.setFont("Helvetica", 9)
-    p.drawString(1*inch, height - 3.25*inch, invoice.client_address)
+INFO_TABLE_STYLE = TableStyle([
+    ('GRID', (0,0), (-1,-1), 1, black),
+    ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'),
+    ('BACKGROUND', (0,0), (0,-1), '#f2f2f2'),
+])
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), HC_DARK), ('TEXTCOLOR', (0,0), (-1,0), (1,1,1)),
+    ('ALIGN', (1,1), (-1,-1), 'CENTER'), ('ALIGN', (3,1), (3,-1), 'RIGHT'),
+    ('GRID', (0,0), (-1,-1), 1, black), 
+    ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0,0), (-1,0), 10), ('TOPPADDING', (0,0), (-1,0), 10),
+])
+
+COMMENTS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (0,0), HC_DARK), ('TEXTCOLOR', (0,0), (0,0), (1,1,1)),
+    ('GRID', (0,0), (-1,-1), 1, black), ('VALIGN', (0,0), (-1,-1), 'TOP'),
+    ('ALIGN', (1,1), (1,1), 'RIGHT'), ('SPAN', (0,1), (0,2)),
+])
 
-    # Info Box Table
+ITEMS_COLUMN_WIDTHS = [3.5*inch, 1*inch, 1*inch, 1.5*inch]
+ITEMS_HEADER = ('<b>DESCRIPTION</b>', '<b>QUANTITY(SQM)</b>', '<b>PRICE/UNIT</b>', '<b>AMOUNT</b>')
+
+@track_render
+def generate_invoice_pdf(invoice, company_info, layout=None):
+    return generate_invoices_pdf([invoice], company_info, layout)
+
+@track_render
+def generate_invoices_pdf(invoices, company_info, layout=None):
+    """
+    Generates one A4 PDF with a page per invoice. The letterhead is written
+    to the file once and placed under every page.
+    """
+    buffer = new_output()
+    # Use A4 paper size, which is standard for invoices
+    p = canvas.Canvas(buffer, pagesize=A4)
+    cache = ComponentCache(p)
+    for invoice in invoices:
+        draw_full_invoice(p, invoice, company_info, layout=layout, cache=cache)
+        p.showPage()
+    p.save()
+    buffer.seek(0)
+    return buffer
+
+def draw_full_invoice(p, invoice, company_info, layout=None, cache=None):
+    """
+    Draws the complete invoice onto the current page of canvas `p`. With a
+    ComponentCache the letterhead (the company-only layer of the layout) is
+    drawn from a form shared by every page of the canvas.
+    """
+    face = get_face('invoice', 'page', company_info, layout)
+    if cache is None:
+        face.draw(p, {'invoice': invoice})
+        return
+    # A new company version compiles a new face and so gets a new form.
+    cache.place('letterhead', face, face.draw_static, 0, 0, face.width, face.height)
+    face.draw_dynamic(p, {'invoice': invoice})
+
+@register_block('invoice_info_table')
+def draw_invoice_info_table(p, context, params):
+    invoice, company_info = context['invoice'], context['company']
     info_data = [
         ['DATE', invoice.issue_date.strftime('%m/%d/%Y %H:%M')],
         ['DUE DATE', invoice.due_date.strftime('%m/%d/%Y %H:%M') if invoice.due_date else 'N/A'],
-        ['TIN NO.', company_info.tin_number or 'N/A'],
+        ['TIN NO.', (company_info and company_info.tin_number) or 'N/A'],
         ['INVOICE NO.', invoice.invoice_number],
     ]
     info_table = Table(info_data, colWidths=[1*inch, 2*inch])
-    info_table.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 1, black),
-        ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0,0), (0,-1), '#f2f2f2'),
-    ]))
-    info_table.wrapOn(p, width, height)
-    info_table.drawOn(p, 4.5*inch, height - 3.1*inch)
-    
-    # --- 3. Items & Comments Tables ---
-    table_y_start = height - 4.2*inch
-    
+    info_table.setStyle(INFO_TABLE_STYLE)
+    info_table.wrapOn(p, A4[0], A4[1])
+    info_table.drawOn(p, params['x'], params['y'])
+
+@register_block('invoice_lines')
+def draw_invoice_lines(p, context, params):
+    """
+    Items table, comments table and the underlined grand total, flowing down
+    from `top`.
+    """
+    invoice = context['invoice']
+    width, height = params['width'], params['height']
+    left_x, table_y_start = params['x'], params['top']
+
     # Items Table
-    items_header = [Paragraph('<b>DESCRIPTION</b>', styles['Normal']), Paragraph('<b>QUANTITY(SQM)</b>', styles['Normal']), Paragraph('<b>PRICE/UNIT</b>', styles['Normal']), Paragraph('<b>AMOUNT</b>', styles['Normal'])]
-    items_data = [items_header]
-    total_quantity = sum(item.quantity for item in invoice.items.all())
+    items_data = [[Paragraph(label, INVOICE_TEXT_STYLE) for label in ITEMS_HEADER]]
+    items = list(invoice.items.all())
+    total_quantity = sum(item.quantity for item in items)
+    total_amount = sum(item.get_total() for item in items)
     
-    for item in invoice.items.all():
+    for item in items:
         items_data.append([
-            Paragraph(item.description.replace('\n', '<br/>'), styles['Normal']),
+            Paragraph(item.description.replace('\n', '<br/>'), INVOICE_TEXT_STYLE),
             intcomma(item.quantity),
             f"TZS {intcomma(int(item.unit_price))}",
             f"TZS {intcomma(int(item.get_total()))}",
         ])
     
-    items_data.append(['<b>TOTAL</b>', f'<b>{intcomma(total_quantity)}</b>', '', f"<b>TZS {intcomma(int(invoice.get_total()))}</b>"])
+    items_data.append(['<b>TOTAL</b>', f'<b>{intcomma(total_quantity)}</b>', '', f"<b>TZS {intcomma(int(total_amount))}</b>"])
     
-    item_table = Table(items_data, colWidths=[3.5*inch, 1*inch, 1*inch, 1.5*inch])
-    item_table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), hc_dark), ('TEXTCOLOR', (0,0), (-1,0), (1,1,1)),
-        ('ALIGN', (1,1), (-1,-1), 'CENTER'), ('ALIGN', (3,1), (3,-1), 'RIGHT'),
-        ('GRID', (0,0), (-1,-1), 1, black), 
-        ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 10), ('TOPPADDING', (0,0), (-1,0), 10),
-    ]))
+    items_table = Table(items_data, colWidths=ITEMS_COLUMN_WIDTHS)
+    items_table.setStyle(ITEMS_TABLE_STYLE)
     items_width, items_height = items_table.wrapOn(p, width, height)
-    items_table.drawOn(p, 1*inch, table_y_start - items_height)
+    items_table.drawOn(p, left_x, table_y_start - items_height)
 
     # Comments Table
     comments_y_start = table_y_start - items_height - 0.2*inch
     comments_data = [
-        [Paragraph('<b>OTHER COMMENTS</b>', styles['Normal'])],
-        [Paragraph(invoice.other_comments or '', styles['Normal']), f"TZS {intcomma(int(invoice.get_total()))}"],
+        [Paragraph('<b>OTHER COMMENTS</b>', INVOICE_TEXT_STYLE)],
+        [Paragraph(invoice.other_comments or '', INVOICE_TEXT_STYLE), f"TZS {intcomma(int(total_amount))}"],
         [f"<b>Terms of payment:</b> {invoice.terms_of_payment or ''}", '']
     ]
     comments_table = Table(comments_data, colWidths=[5*inch, 2.5*inch])
-    comments_table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (0,0), hc_dark), ('TEXTCOLOR', (0,0), (0,0), (1,1,1)),
-        ('GRID', (0,0), (-1,-1), 1, black), ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('ALIGN', (1,1), (1,1), 'RIGHT'), ('SPAN', (0,1), (0,2)),
-    ]))
+    comments_table.setStyle(COMMENTS_TABLE_STYLE)
     comments_width, comments_height = comments_table.wrapOn(p, width, height)
-    comments_table.drawOn(p, 1*inch, comments_y_start - comments_height)
+    comments_table.drawOn(p, left_x, comments_y_start - comments_height)
     
     # --- 4. Final Total ---
     final_total_y = comments_y_start - comments_height - 0.5*inch
+    p.setFillColor(black)
+    p.setStrokeColor(HC_GOLD)
     p.setFont("Helvetica-Bold", 11)
     p.drawRightString(6.5*inch, final_total_y, "TOTAL AMOUNT")
-    total_amount_str = f"TZS {intcomma(int(invoice.get_total()))}"
+    total_amount_str = f"TZS {intcomma(int(total_amount))}"
     p.drawRightString(7.5*inch, final_total_y, total_amount_str)
     p.setLineWidth(2)
     p.line(7.5*inch - p.stringWidth(total_amount_str) - 5, final_total_y-2, 7.5*inch, final_total_y-2)
     p.line(7.5*inch - p.stringWidth(total_amount_str) - 5, final_total_y-1, 7.5*inch, final_total_y-1)
 
-    # --- 5. Footer ---
-    p.setFont("Helvetica", 9)
-    p.drawCentredString(width/2, 1*inch, "If you have any question about this invoice, please contact")
-    p.drawCentredString(width/2, 0.8*inch, f"{company_info.phone or ''} | {company_info.name or ''}")
-    
-    p.save()
-    buffer.seek(0)
-    return buffer
+# ==============================================================================
+# WELCOME PACKAGE (BUNDLE) PDF GENERATION UTILITY
+# ==============================================================================
+def _business_card_for(employee):
+    try:
+        return employee.business_card
+    except BusinessCard.DoesNotExist:
+        return None
 
-def generate_welcome_package_pdf(employee, invoice, company_info):
+
+def draw_welcome_cards_page(p, cache, employee, company_info, layout=None):
     """
-    Generates a single, multi-part A4 PDF containing a full invoice
-    and the employee's ID card (front and back).
+    Draws one employee's ID card (front and back) and business card (front
+    and back) on the current page. Company-only layers come from `cache`.
     """
-    buffer = io.BytesIO()
-    # Create an A4 canvas
-    p = canvas.Canvas(buffer, pagesize='A4')
-    width, height = letter # Use letter dimensions for inch calculations
+    width, height = A4
+    card_width, card_height = CARD_WIDTH_MM * mm, CARD_HEIGHT_MM * mm
+    left_x = 0.6 * inch
+
+    p.setFillColor(HexColor('#2C3E50'))
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(left_x, height - 1*inch, f"Welcome to {company_info.name}, {employee.full_name}")
+    p.setFont("Helvetica", 9)
+    p.drawString(left_x, height - 1.25*inch, f"{employee.job_title} | {employee.department} | ID: {employee.employee_id}")
 
-    # --- 1. Draw the full invoice on the top part of the page ---
-    # We pass the canvas 'p' to our existing invoice drawing function
-    draw_full_invoice(p, invoice, company_info)
+    # --- ID card front and back ---
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(left_x, height - 1.75*inch, "ID CARD")
+    id_y = height - 1.9*inch - card_height
+    card_context = {'employee': employee}
+    draw_face(p, cache, get_face('id_card', 'front', company_info, layout), card_context, left_x, id_y)
+    draw_face(p, cache, get_face('id_card', 'back', company_info, layout), card_context,
+              left_x + card_width + 0.3*inch, id_y)
 
-    # --- 2. Draw the ID Card Front and Back at the bottom ---
-    # We pass the canvas 'p' to a new helper function
-    draw_id_cards_on_page(p, employee, company_info)
+    # --- Business card front and back ---
+    p.setFillColor(HexColor('#2C3E50'))
+    p.setFont("Helvetica-Bold", 10)
+    business_label_y = id_y - 0.5*inch
+    p.drawString(left_x, business_label_y, "BUSINESS CARD")
+    business_y = business_label_y - 0.15*inch - BUSINESS_CARD_HEIGHT
+    business_context = {'employee': employee, 'card': _business_card_for(employee)}
+    draw_face(p, cache, get_face('business_card', 'front', company_info, layout), business_context, left_x, business_y)
+    draw_face(p, cache, get_face('business_card', 'back', company_info, layout), business_context,
+              left_x + BUSINESS_CARD_WIDTH + 0.25*inch, business_y)
 
-    # Finalize the single page and save the PDF
-    p.showPage()
+
+@track_render
+def generate_welcome_packages_pdf(employees, invoice, company_info, layout=None):
+    """
+    Generates one A4 PDF holding a welcome package for each employee: the
+    invoice page followed by a page with their ID card and business card.
+    The invoice and the company layers of the cards are rendered once and
+    reused for every employee in the batch.
+    """
+    buffer = new_output()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    cache = ComponentCache(p)
+    page_width, page_height = A4
+    for employee in employees:
+        cache.place('invoice', (invoice.pk, layout), lambda c: draw_full_invoice(c, invoice, company_info, layout),
+                    0, 0, page_width, page_height)
+        p.showPage()
+        draw_welcome_cards_page(p, cache, employee, company_info, layout)
+        p.showPage()
     p.save()
-    
     buffer.seek(0)
     return buffer
 
 
-def draw_id_cards_on_page(p, employee, company_info):
+@track_render
+def generate_welcome_package_pdf(employee, invoice, company_info, layout=None):
     """
-    Helper function to draw both the front and back of the ID card
-    at the bottom of an existing canvas.
+    Generates a single A4 PDF containing the full invoice and the employee's
+    ID card and business card.
     """
-    # Define Card Dimensions in inches for easy placement
-    CARD_WIDTH_IN = 3.375 * inch
-    CARD_HEIGHT_IN = 2.125 * inch
-    
-    # --- Draw Front of Card on the left side ---
-    front_x = 0.5 * inch
-    front_y = 0.5 * inch # Place 0.5 inches from the bottom
-    # We will need to create a specific `draw_card_front_pdf` helper for this
-    # For now, let's just draw a placeholder
-    p.rect(front_x, front_y, CARD_WIDTH_IN, CARD_HEIGHT_IN, stroke=1, fill=0)
-    p.drawCentredString(front_x + CARD_WIDTH_IN/2, front_y + CARD_HEIGHT_IN/2, "ID Card Front")
-    
-    # --- Draw Back of Card on the right side ---
-    back_x = front_x + CARD_WIDTH_IN + 0.25*inch
-    back_y = 0.5 * inch
-    p.rect(back_x, back_y, CARD_WIDTH_IN, CARD_HEIGHT_IN, stroke=1, fill=0)
-    p.drawCentredString(back_x + CARD_WIDTH_IN/2, back_y + CARD_HEIGHT_IN/2, "ID Card Back")
\ No newline at end of file
+    return generate_welcome_packages_pdf([employee], invoice, company_info, layout)
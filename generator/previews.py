@@ -0,0 +1,230 @@
+# generator/previews.py
+
+import hashlib
+import io
+import logging
+import queue
+import re
+import threading
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.urls import reverse
+from .models import CompanyInfo, Employee, Invoice
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# RASTER DOCUMENT PREVIEWS
+# ==============================================================================
+# Small PNG/WebP images of the front of each document for the dashboard grids.
+# A preview is stored under a fingerprint of everything that affects how the
+# document looks: the record itself, the company record and the layout
+# version. A changed source therefore gets a new URL, so a stored preview
+# never changes and can be cached by the browser for good.
+#
+# Previews are rendered by a background thread when their source is saved
+# (see signals.py) and, failing that, once on the first request for them.
+
+PREVIEW_ROOT = 'previews'
+PREVIEW_FORMATS = {'png': 'PNG', 'webp': 'WEBP'}
+DEFAULT_FORMAT = getattr(settings, 'DOCUMENT_PREVIEW_FORMAT', 'webp')
+# Pixel width of each preview; roughly twice the width it is shown at.
+PREVIEW_WIDTHS = {'id_card': 340, 'invoice': 150}
+_FINGERPRINT_RE = re.compile(r'^[0-9a-f]{20}$')
+
+
+class PreviewError(Exception):
+    """
+    Raised for an unknown preview kind or format.
+    """
+
+
+def _layout_kind(kind):
+    if kind not in PREVIEW_WIDTHS:
+        raise PreviewError(f"Unknown preview kind '{kind}'.")
+    return kind
+
+
+def is_fingerprint(value):
+    return bool(_FINGERPRINT_RE.match(value))
+
+
+# ==============================================================================
+# FINGERPRINTS
+# ==============================================================================
+def _record_values(instance):
+    return [getattr(instance, field.attname) for field in instance._meta.concrete_fields]
+
+
+def _base_key(kind, company_info):
+    """
+    The part of a fingerprint shared by every record of `kind`: the layout
+    version and the company version.
+    """
+    from .layouts import company_version, get_layout
+    return [kind, get_layout(_layout_kind(kind)).version, company_version(company_info)]
+
+
+def _fingerprint(base_key, instance, kind):
+    values = base_key + _record_values(instance)
+    if kind == 'invoice':
+        # Uses the prefetched items when the caller loaded them.
+        values += [_record_values(item) for item in instance.items.all()]
+    return hashlib.sha1(repr(values).encode()).hexdigest()[:20]
+
+
+def fingerprint(kind, instance, company_info):
+    return _fingerprint(_base_key(kind, company_info), instance, kind)
+
+
+def storage_name(kind, object_id, fingerprint, fmt):
+    return f"{PREVIEW_ROOT}/{kind}/{object_id}/{fingerprint}.{fmt}"
+
+
+def attach_preview_urls(kind, instances, company_info, fmt=DEFAULT_FORMAT):
+    """
+    Sets `preview_url` on every instance. Only fingerprints are computed
+    here; nothing is rendered. Invoices should have their items prefetched.
+    """
+    instances = list(instances)
+    base_key = _base_key(kind, company_info) if company_info else None
+    for instance in instances:
+        if base_key is None:
+            instance.preview_url = None
+            continue
+        instance.preview_url = reverse('generator:document_preview', kwargs={
+            'kind': kind,
+            'object_id': instance.pk,
+            'fingerprint': _fingerprint(base_key, instance, kind),
+            'fmt': fmt,
+        })
+    return instances
+
+
+# ==============================================================================
+# RENDERING
+# ==============================================================================
+def _render_front_pdf(kind, instance, company_info):
+    from . import pdf_utils
+    if kind == 'invoice':
+        with pdf_utils.generate_invoice_pdf(instance, company_info) as output:
+            return output.read()
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=(pdf_utils.CARD_WIDTH_MM * mm, pdf_utils.CARD_HEIGHT_MM * mm))
+    pdf_utils.draw_card_front(p, instance, company_info, y_offset=0)
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def render_preview(kind, instance, company_info, fmt=DEFAULT_FORMAT):
+    """
+    Renders the first page of the document to image bytes in `fmt`.
+    """
+    import pypdfium2
+    if fmt not in PREVIEW_FORMATS:
+        raise PreviewError(f"Unknown preview format '{fmt}'.")
+    document = pypdfium2.PdfDocument(_render_front_pdf(kind, instance, company_info))
+    try:
+        page = document[0]
+        image = page.render(scale=PREVIEW_WIDTHS[kind] / page.get_width()).to_pil()
+    finally:
+        document.close()
+    output = io.BytesIO()
+    if fmt == 'webp':
+        image.save(output, 'WEBP', quality=80, method=4)
+    else:
+        image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+def _remove_stale(kind, object_id, keep):
+    directory = f"{PREVIEW_ROOT}/{kind}/{object_id}"
+    try:
+        names = default_storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.rsplit('.', 1)[0] != keep:
+            default_storage.delete(f"{directory}/{name}")
+
+
+def ensure_preview(kind, instance, company_info, fmt=DEFAULT_FORMAT):
+    """
+    Returns the storage name of the current preview, rendering it first if it
+    is missing. Previews of older fingerprints are removed.
+    """
+    current = fingerprint(kind, instance, company_info)
+    name = storage_name(kind, instance.pk, current, fmt)
+    if not default_storage.exists(name):
+        content = render_preview(kind, instance, company_info, fmt)
+        _remove_stale(kind, instance.pk, current)
+        # Storage picks a new name if another worker won the race; keep theirs.
+        saved = default_storage.save(name, ContentFile(content))
+        if saved != name:
+            default_storage.delete(saved)
+    return name
+
+
+def load_instance(kind, object_id):
+    if _layout_kind(kind) == 'invoice':
+        return Invoice.objects.prefetch_related('items').filter(pk=object_id).first()
+    return Employee.objects.filter(pk=object_id).first()
+
+
+def delete_previews(kind, object_id):
+    _remove_stale(kind, object_id, keep=None)
+
+
+# ==============================================================================
+# BACKGROUND GENERATION
+# ==============================================================================
+# One daemon thread per process drains a queue of (kind, id) pairs. Requests
+# that arrive while a job is queued are merged into it.
+_queue = queue.Queue()
+_pending = set()
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def _work():
+    while True:
+        job = _queue.get()
+        with _pending_lock:
+            _pending.discard(job)
+        kind, object_id = job
+        try:
+            instance = load_instance(kind, object_id)
+            company_info = CompanyInfo.objects.first()
+            if instance is None:
+                delete_previews(kind, object_id)
+            elif company_info is not None:
+                ensure_preview(kind, instance, company_info)
+        except Exception:
+            logger.exception("Could not render the %s preview for %s.", kind, object_id)
+        finally:
+            # Do not keep this thread's database connections open between jobs.
+            connections.close_all()
+
+
+def schedule(kind, object_ids):
+    """
+    Queues previews for background rendering, unless disabled with
+    settings.DOCUMENT_PREVIEW_BACKGROUND = False.
+    """
+    global _worker
+    if not getattr(settings, 'DOCUMENT_PREVIEW_BACKGROUND', True):
+        return
+    with _pending_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_work, name='document-previews', daemon=True)
+            _worker.start()
+        for object_id in object_ids:
+            job = (kind, object_id)
+            if job not in _pending:
+                _pending.add(job)
+                _queue.put(job)
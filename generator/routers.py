@@ -0,0 +1,160 @@
+# generator/routers.py
+
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# READ-REPLICA ROUTING
+# ==============================================================================
+# With a replica configured (DATABASE_REPLICA_URL), reads in a "replica
+# scope" go to the replica alias and everything else uses the primary:
+#
+# - DatabaseRoutingMiddleware opens a replica scope for GET/HEAD requests to
+#   generator views (dashboards, previews, PDF downloads, exports). Logins,
+#   form posts, the admin and the ingest API stay on the primary.
+# - Once anything in a scope writes, the rest of it reads from the primary, and
+#   the response sets a short-lived cookie that keeps the browser's following
+#   requests on the primary for DATABASE_REPLICA_STICKY_SECONDS, so a redirect
+#   after a save shows the saved data even if the replica lags behind.
+# - If the replica cannot be reached it is skipped for
+#   DATABASE_REPLICA_RETRY_SECONDS and reads go to the primary.
+# - Jobs outside a request (report or render commands) opt in with
+#   `with replica_reads():`.
+#
+# Migrations never run on the replica. Locally, two SQLite files work: point
+# DATABASE_REPLICA_URL at a second file and copy the primary into it with
+# `manage.py sync_sqlite_replica`.
+
+REPLICA = getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+STICKY_SECONDS = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 5)
+RETRY_SECONDS = getattr(settings, 'DATABASE_REPLICA_RETRY_SECONDS', 30)
+STICKY_COOKIE = 'dms_primary'
+
+
+class RoutingState:
+    """
+    The routing decisions of one request or job.
+    """
+
+    def __init__(self, read_replica=False):
+        self.read_replica = read_replica
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('generator_db_routing', default=None)
+_replica_down_until = 0.0
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def routing_scope(state):
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+def replica_reads():
+    """
+    A scope whose reads go to the replica until it writes.
+    """
+    return routing_scope(RoutingState(read_replica=True))
+
+
+def replica_available():
+    """
+    True if a replica is configured and can be connected to. A failure is
+    remembered for RETRY_SECONDS so requests do not each wait on it.
+    """
+    global _replica_down_until
+    if REPLICA is None or time.monotonic() < _replica_down_until:
+        return False
+    connection = connections[REPLICA]
+    try:
+        # Connecting to a missing SQLite file would create an empty database.
+        if connection.vendor == 'sqlite' and not os.path.exists(connection.settings_dict['NAME']):
+            raise FileNotFoundError(connection.settings_dict['NAME'])
+        connection.ensure_connection()
+    except Exception as exc:
+        _replica_down_until = time.monotonic() + RETRY_SECONDS
+        logger.warning("Database replica '%s' unavailable, reading from the primary for %ss: %s",
+                       REPLICA, RETRY_SECONDS, exc)
+        return False
+    return True
+
+
+def read_alias():
+    """
+    The alias reads in the current scope go to. For querysets that are
+    evaluated after the scope ends, such as streamed exports.
+    """
+    state = _state.get()
+    if state is not None and state.read_replica and not state.wrote and replica_available():
+        return REPLICA
+    return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Sends reads in a replica scope to the replica and every write, and every
+    read after a write, to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        databases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if REPLICA is not None and db == REPLICA:
+            return False
+        return None
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Opens a routing scope per request; see the module comment. Place it
+    before SessionMiddleware so session saves count as writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing_scope(RoutingState()) as state:
+            response = self.get_response(request)
+        if state.wrote and REPLICA is not None:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is not None and not state.wrote:
+            state.read_replica = (
+                request.method in ('GET', 'HEAD')
+                and view_func.__module__.startswith('generator.')
+                and STICKY_COOKIE not in request.COOKIES
+            )
+        return None
@@ -0,0 +1,263 @@
+# generator/search.py
+
+import re
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from .models import Invoice, InvoiceItem
+
+# ==============================================================================
+# FULL-TEXT SEARCH OVER INVOICES AND LINE ITEMS
+# ==============================================================================
+# One index row is kept per invoice. SQLite uses an FTS5 virtual table whose
+# rowid is the invoice id; PostgreSQL uses a side table holding a weighted
+# tsvector behind a GIN index. Any other backend falls back to icontains.
+
+SQLITE_TABLE = 'generator_invoice_fts'
+POSTGRES_TABLE = 'generator_invoice_search'
+POSTGRES_CONFIG = 'english'
+
+# Private-use markers wrap matched terms inside snippets so the surrounding
+# user text can be HTML-escaped before the <mark> tags are put in.
+_MARK_START = '\ue000'
+_MARK_END = '\ue001'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+INDEX_CHUNK_SIZE = 500
+DEFAULT_LIMIT = 50
+
+
+def is_supported(using='default'):
+    """
+    Returns True when the database behind `using` has a native full-text index.
+    """
+    return connections[using].vendor in ('sqlite', 'postgresql')
+
+
+def _query_tokens(query):
+    return _TOKEN_RE.findall(query or '')[:16]
+
+
+def _chunks(values, size=INDEX_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _build_documents(invoice_ids, using):
+    """
+    Collects the indexed text for each invoice in two queries.
+    """
+    descriptions = {}
+    item_rows = (
+        InvoiceItem.objects.using(using)
+        .filter(invoice_id__in=invoice_ids)
+        .order_by('id')
+        .values_list('invoice_id', 'description')
+    )
+    for invoice_id, description in item_rows:
+        descriptions.setdefault(invoice_id, []).append(description)
+
+    invoice_rows = (
+        Invoice.objects.using(using)
+        .filter(id__in=invoice_ids)
+        .values_list('id', 'client_name', 'client_address', 'other_comments')
+    )
+    for invoice_id, client_name, client_address, other_comments in invoice_rows:
+        yield (
+            invoice_id,
+            client_name or '',
+            client_address or '',
+            other_comments or '',
+            '\n'.join(descriptions.get(invoice_id, [])),
+        )
+
+
+# ==============================================================================
+# INDEX MAINTENANCE
+# ==============================================================================
+def index_invoices(invoice_ids, using='default'):
+    """
+    Re-indexes the given invoices. Ids that no longer exist are removed from
+    the index, so this also handles deletes.
+    """
+    if not is_supported(using):
+        return
+    connection = connections[using]
+    for chunk in _chunks(set(invoice_ids)):
+        documents = list(_build_documents(chunk, using))
+        placeholders = ', '.join(['%s'] * len(chunk))
+        # One transaction per chunk; in autocommit mode SQLite would otherwise
+        # commit (and sync) once per inserted row.
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({placeholders})", chunk)
+                if documents:
+                    cursor.executemany(
+                        f"INSERT INTO {SQLITE_TABLE} (rowid, client_name, client_address, other_comments, items) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        documents,
+                    )
+            else:
+                cursor.execute(f"DELETE FROM {POSTGRES_TABLE} WHERE invoice_id IN ({placeholders})", chunk)
+                if documents:
+                    cursor.executemany(
+                        f"INSERT INTO {POSTGRES_TABLE} (invoice_id, body, document) VALUES ("
+                        "%s, concat_ws(' ', %s, %s, %s, %s), "
+                        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+                        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'C') || "
+                        f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'D'))",
+                        [
+                            (pk, name, address, items, comments, name, address, items, comments)
+                            for pk, name, address, comments, items in documents
+                        ],
+                    )
+
+
+def rebuild_index(using='default'):
+    """
+    Drops every index row and re-indexes all invoices. Returns the number of
+    invoices indexed.
+    """
+    if not is_supported(using):
+        return 0
+    connection = connections[using]
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+    invoice_ids = Invoice.objects.using(using).order_by('id').values_list('id', flat=True)
+    count = 0
+    for chunk in _chunks(invoice_ids.iterator(chunk_size=INDEX_CHUNK_SIZE)):
+        index_invoices(chunk, using=using)
+        count += len(chunk)
+    return count
+
+
+# ==============================================================================
+# QUERYING
+# ==============================================================================
+def _render_snippet(raw):
+    return escape(raw or '').replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _sqlite_match(tokens):
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _postgres_tsquery(tokens):
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def _search_sqlite(cursor, tokens, limit, offset):
+    cursor.execute(
+        f"SELECT rowid, bm25({SQLITE_TABLE}, 10.0, 4.0, 1.0, 2.0) AS rank, "
+        f"snippet({SQLITE_TABLE}, -1, %s, %s, '…', 12) "
+        f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s ORDER BY rank, rowid LIMIT %s OFFSET %s",
+        [_MARK_START, _MARK_END, _sqlite_match(tokens), limit, offset],
+    )
+    # bm25() is "lower is better"; flip it so callers can treat rank uniformly.
+    return [(pk, -rank, snippet) for pk, rank, snippet in cursor.fetchall()]
+
+
+def _search_postgres(cursor, tokens, limit, offset):
+    tsquery = _postgres_tsquery(tokens)
+    headline_options = f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=20, MinWords=8'
+    cursor.execute(
+        "SELECT hits.invoice_id, hits.rank, "
+        f"ts_headline('{POSTGRES_CONFIG}', hits.body, to_tsquery('{POSTGRES_CONFIG}', %s), %s) "
+        "FROM ("
+        f"  SELECT invoice_id, body, ts_rank_cd(document, q) AS rank "
+        f"  FROM {POSTGRES_TABLE}, to_tsquery('{POSTGRES_CONFIG}', %s) q "
+        "  WHERE document @@ q ORDER BY rank DESC, invoice_id LIMIT %s OFFSET %s"
+        ") hits ORDER BY hits.rank DESC, hits.invoice_id",
+        [tsquery, headline_options, tsquery, limit, offset],
+    )
+    return cursor.fetchall()
+
+
+def _fallback_matches(tokens, using):
+    invoices = Invoice.objects.using(using)
+    for token in tokens:
+        invoices = invoices.filter(
+            Q(client_name__icontains=token) | Q(client_address__icontains=token)
+            | Q(other_comments__icontains=token) | Q(items__description__icontains=token)
+        )
+    return invoices.distinct()
+
+
+def _search_fallback(tokens, limit, offset, using):
+    ids = _fallback_matches(tokens, using).order_by('-issue_date', 'id').values_list('id', flat=True)
+    return [(pk, 0.0, '') for pk in ids[offset:offset + limit]]
+
+
+def search_invoices(query, limit=DEFAULT_LIMIT, offset=0, using='default'):
+    """
+    Returns up to `limit` invoices matching `query`, best match first,
+    skipping the first `offset`. Each invoice carries a `search_rank` and an
+    HTML-safe `search_snippet` with the matched terms wrapped in <mark> tags.
+    """
+    tokens = _query_tokens(query)
+    if not tokens:
+        return []
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            hits = _search_sqlite(cursor, tokens, limit, offset)
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            hits = _search_postgres(cursor, tokens, limit, offset)
+    else:
+        hits = _search_fallback(tokens, limit, offset, using)
+
+    invoices = Invoice.objects.using(using).in_bulk([pk for pk, rank, snippet in hits])
+    results = []
+    for pk, rank, snippet in hits:
+        invoice = invoices.get(pk)
+        if invoice is None:
+            continue
+        invoice.search_rank = rank
+        invoice.search_snippet = _render_snippet(snippet)
+        results.append(invoice)
+    return results
+
+
+def count_matches(query, using='default'):
+    """
+    Returns how many invoices match `query`.
+    """
+    tokens = _query_tokens(query)
+    if not tokens:
+        return 0
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [_sqlite_match(tokens)])
+            return cursor.fetchone()[0]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {POSTGRES_TABLE}, to_tsquery('{POSTGRES_CONFIG}', %s) q WHERE document @@ q",
+                [_postgres_tsquery(tokens)],
+            )
+            return cursor.fetchone()[0]
+    return _fallback_matches(tokens, using).count()
+
+
+class SearchResults:
+    """
+    Every invoice matching `query`, for a Paginator: count() runs a count
+    query and slicing fetches only the requested page.
+    """
+
+    def __init__(self, query, using='default'):
+        self.query = query
+        self.using = using
+
+    def count(self):
+        return count_matches(self.query, using=self.using)
+
+    def __getitem__(self, page):
+        start, stop = page.start or 0, page.stop
+        return search_invoices(self.query, limit=stop - start, offset=start, using=self.using)
@@ -0,0 +1,120 @@
+# generator/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from .models import BusinessCard, CompanyInfo, Employee, Invoice, InvoiceItem
+from . import changefeed, images, previews, search
+
+# ==============================================================================
+# SEARCH INDEX MAINTENANCE
+# ==============================================================================
+# The index is refreshed once the surrounding transaction commits, so an
+# invoice saved together with its items is indexed with its final contents.
+# Each change adds its invoice id to a set kept per connection (and so per
+# transaction) and registers an on_commit flush; the first flush indexes the
+# whole set and the others find it empty, so an invoice saved with N items is
+# indexed once rather than N + 1 times. Ids left by a rolled-back transaction
+# are indexed with the next flush, which only costs a redundant reindex.
+
+def _flush_reindex(connection, using):
+    invoice_ids, connection._pending_reindex = connection._pending_reindex, set()
+    if invoice_ids:
+        search.index_invoices(invoice_ids, using=using)
+
+
+def _schedule_reindex(invoice_id, using):
+    connection = transaction.get_connection(using)
+    if not hasattr(connection, '_pending_reindex'):
+        connection._pending_reindex = set()
+    connection._pending_reindex.add(invoice_id)
+    transaction.on_commit(lambda: _flush_reindex(connection, using), using=using)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def reindex_invoice(sender, instance, using, **kwargs):
+    _schedule_reindex(instance.pk, using)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def reindex_invoice_item(sender, instance, using, **kwargs):
+    _schedule_reindex(instance.invoice_id, using)
+
+
+# ==============================================================================
+# PREVIEW IMAGES
+# ==============================================================================
+# Previews are re-rendered in the background after the change commits. A
+# company change is not queued: it changes every preview's fingerprint, so
+# each stale preview is re-rendered when it is next viewed. The
+# render_previews command refreshes them all in bulk.
+
+def _schedule_previews(kind, object_ids, using):
+    transaction.on_commit(lambda: previews.schedule(kind, object_ids), using=using)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def refresh_employee_preview(sender, instance, using, **kwargs):
+    _schedule_previews('id_card', [instance.pk], using)
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def refresh_invoice_preview(sender, instance, using, **kwargs):
+    _schedule_previews('invoice', [instance.pk], using)
+
+
+@receiver(post_save, sender=InvoiceItem)
+@receiver(post_delete, sender=InvoiceItem)
+def refresh_invoice_item_preview(sender, instance, using, **kwargs):
+    _schedule_previews('invoice', [instance.invoice_id], using)
+
+
+# ==============================================================================
+# UPLOADED IMAGES
+# ==============================================================================
+# A new photo or logo is normalised before it is stored; its variants are
+# written once the file has its final storage name.
+
+@receiver(pre_save, sender=Employee)
+@receiver(pre_save, sender=CompanyInfo)
+def normalize_uploaded_image(sender, instance, raw, **kwargs):
+    if not raw:
+        instance._uploaded_image = images.normalize_upload(instance)
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_save, sender=CompanyInfo)
+def generate_image_variants(sender, instance, raw, **kwargs):
+    image = instance.__dict__.pop('_uploaded_image', None)
+    if image is not None:
+        images.generate_variants(instance, image)
+
+
+# ==============================================================================
+# CHANGE FEED
+# ==============================================================================
+# Entries are written in the transaction of the change they describe when
+# one is open. The views, the admin, ingest and the management commands make
+# their writes inside transaction.atomic(). A save in autocommit mode (a shell
+# session, say) commits first, and its entry is written in a transaction of
+# its own right after. If the process dies in between, that row has no new
+# entry until it next changes; see changefeed.py for resyncing.
+
+@receiver(post_save, sender=Employee)
+@receiver(post_save, sender=BusinessCard)
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=InvoiceItem)
+def record_saved_change(sender, instance, using, **kwargs):
+    changefeed.record(sender, [instance.pk], using)
+
+
+@receiver(post_delete, sender=Employee)
+@receiver(post_delete, sender=BusinessCard)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=InvoiceItem)
+def record_deleted_change(sender, instance, using, **kwargs):
+    changefeed.record(sender, [instance.pk], using, deleted=True)
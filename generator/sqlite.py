@@ -0,0 +1,113 @@
+# generator/sqlite.py
+
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# ==============================================================================
+# SQLITE PERFORMANCE MODE
+# ==============================================================================
+# Branch offices run on the default SQLite database. With SQLite's own
+# defaults (rollback journal, synchronous=FULL, no memory map) a writer locks
+# out every reader, so dashboards stall while an invoice is saved. With
+# SQLITE_PERFORMANCE_MODE on (the default), every new SQLite connection gets:
+#
+# - journal_mode=WAL: readers keep reading the last committed state while one
+#   writer appends to the write-ahead log;
+# - synchronous=NORMAL: the WAL is synced at checkpoints rather than on every
+#   commit. A power cut can lose the last commits but never corrupts the
+#   database;
+# - mmap_size, cache_size and temp_store=MEMORY: fewer read() calls and
+#   page-cache misses;
+# - busy_timeout: a connection waits for a lock instead of failing at once.
+#
+# Each process also runs `PRAGMA optimize` and a PASSIVE WAL checkpoint at
+# most once every SQLITE_MAINTENANCE_INTERVAL seconds, after a request has
+# finished, so the WAL does not grow without bound under constant readers. A
+# passive checkpoint copies what it can without waiting on other connections,
+# so it never holds up the worker thread. `manage.py sqlite_maintenance` runs
+# a TRUNCATE checkpoint, which waits for writers (up to busy_timeout) and then
+# resets the WAL file to zero bytes; run it from cron or off-peak. `manage.py
+# sqlite_benchmark` measures the difference.
+
+PERFORMANCE_MODE = getattr(settings, 'SQLITE_PERFORMANCE_MODE', True)
+MMAP_SIZE = getattr(settings, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+CACHE_SIZE_KIB = getattr(settings, 'SQLITE_CACHE_SIZE_KIB', 20000)
+BUSY_TIMEOUT_MS = getattr(settings, 'SQLITE_BUSY_TIMEOUT_MS', 5000)
+MAINTENANCE_INTERVAL = getattr(settings, 'SQLITE_MAINTENANCE_INTERVAL', 600)
+
+# journal_mode is stored in the database file; the rest are per connection.
+PERFORMANCE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA mmap_size={MMAP_SIZE}',
+    # A negative cache_size is in KiB rather than pages.
+    f'PRAGMA cache_size=-{CACHE_SIZE_KIB}',
+    'PRAGMA temp_store=MEMORY',
+    f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}',
+)
+
+_last_maintenance = time.monotonic()
+_maintenance_lock = threading.Lock()
+
+
+def apply_pragmas(cursor, pragmas=PERFORMANCE_PRAGMAS):
+    for pragma in pragmas:
+        cursor.execute(pragma)
+
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+def run_maintenance(cursor, checkpoint='PASSIVE'):
+    """
+    Refreshes the query planner statistics and folds the WAL back into the
+    database with a `checkpoint` mode checkpoint. Returns (log frames, frames
+    checkpointed); the checkpoint is partial if readers still need older
+    frames.
+    """
+    if checkpoint not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown WAL checkpoint mode: {checkpoint}")
+    cursor.execute('PRAGMA optimize')
+    cursor.execute(f'PRAGMA wal_checkpoint({checkpoint})')
+    busy, log_frames, checkpointed = cursor.fetchone()
+    return log_frames, checkpointed
+
+
+def _sqlite_connections():
+    return [connection for connection in connections.all(initialized_only=True) if connection.vendor == 'sqlite']
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if PERFORMANCE_MODE and connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor)
+
+
+@receiver(request_finished)
+def periodic_sqlite_maintenance(sender, **kwargs):
+    global _last_maintenance
+    if not PERFORMANCE_MODE or time.monotonic() - _last_maintenance < MAINTENANCE_INTERVAL:
+        return
+    if not _maintenance_lock.acquire(blocking=False):
+        return
+    try:
+        _last_maintenance = time.monotonic()
+        for connection in _sqlite_connections():
+            if connection.connection is None or connection.in_atomic_block:
+                continue
+            try:
+                with connection.cursor() as cursor:
+                    run_maintenance(cursor, 'PASSIVE')
+            except Exception:
+                logger.exception("SQLite maintenance failed on '%s'.", connection.alias)
+    finally:
+        _maintenance_lock.release()
@@ -1,3 +1,406 @@
-from django.test import TestCase
+import json
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from . import admission, changefeed, coalesce, ingest
+from .models import Change, CompanyInfo, Invoice, InvoiceItem
 
-# Create your tests here.
+
+def _invoice_record(**overrides):
+    record = {
+        'client_name': 'Kilimanjaro Tiles',
+        'client_address': 'Plot 12, Arusha',
+        'issue_date': '2026-10-01T09:00:00',
+        'items': [
+            {'description': 'Floor tiling', 'quantity': '12.50', 'unit_price': '4000.00'},
+            {'description': 'Grout', 'quantity': '2', 'unit_price': '1500.00'},
+        ],
+    }
+    record.update(overrides)
+    return record
+
+
+@override_settings(INVOICE_INGEST_API_TOKEN='ingest-token', DOCUMENT_PREVIEW_BACKGROUND=False)
+class InvoiceIngestApiTests(TestCase):
+    """
+    The bulk invoice ingest endpoint: authentication, batch validation and
+    invoice number allocation.
+    """
+
+    def post(self, payload, token='ingest-token'):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        return self.client.post(
+            reverse('generator:api_ingest_invoices'), json.dumps(payload), content_type='application/json', **headers
+        )
+
+    def test_creates_invoices_with_items(self):
+        response = self.post([_invoice_record(), _invoice_record(client_name='Mwanza Builders')])
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['created'], 2)
+        first = body['results'][0]
+        self.assertEqual(first['status'], 'created')
+        self.assertEqual(first['item_count'], 2)
+        self.assertEqual(first['total'], '53000.0000')
+        invoice = Invoice.objects.get(pk=first['id'])
+        self.assertEqual(invoice.invoice_number, first['invoice_number'])
+        self.assertEqual(invoice.items.count(), 2)
+        self.assertEqual(Invoice.objects.count(), 2)
+
+    def test_accepts_an_object_with_an_invoices_list(self):
+        response = self.post({'invoices': [_invoice_record()]})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_allocates_consecutive_invoice_numbers(self):
+        Invoice.objects.create(client_name='Existing', client_address='Dodoma', issue_date='2026-09-01T00:00:00Z')
+
+        response = self.post([_invoice_record(), _invoice_record()])
+
+        numbers = [result['invoice_number'] for result in response.json()['results']]
+        self.assertEqual(numbers, ['INV-0002', 'INV-0003'])
+
+    def test_rejects_missing_or_wrong_token(self):
+        for token in (None, 'wrong-token'):
+            with self.subTest(token=token):
+                response = self.post([_invoice_record()], token=token)
+                self.assertEqual(response.status_code, 401)
+        self.assertFalse(Invoice.objects.exists())
+
+    @override_settings(INVOICE_INGEST_API_TOKEN='')
+    def test_is_disabled_without_a_configured_token(self):
+        response = self.post([_invoice_record()], token='')
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_rejects_malformed_json(self):
+        response = self.client.post(
+            reverse('generator:api_ingest_invoices'), '{not json', content_type='application/json',
+            HTTP_AUTHORIZATION='Bearer ingest-token',
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_empty_and_non_list_batches(self):
+        for payload in ([], {'invoices': 'nope'}):
+            with self.subTest(payload=payload):
+                response = self.post(payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_rejects_batches_over_the_size_cap(self):
+        with mock.patch.object(ingest, 'MAX_BATCH_SIZE', 2):
+            response = self.post([_invoice_record()] * 3)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most 2', response.json()['error'])
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_one_invalid_record_writes_nothing_and_reports_per_row_errors(self):
+        bad_items = [{'description': 'Tiles', 'quantity': 'many', 'unit_price': '10'}]
+        response = self.post([
+            _invoice_record(),
+            _invoice_record(client_name='', items=bad_items),
+            _invoice_record(items=[]),
+            'not an object',
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body['created'], 0)
+        statuses = [result['status'] for result in body['results']]
+        self.assertEqual(statuses, ['valid', 'invalid', 'invalid', 'invalid'])
+        errors = body['results'][1]['errors']
+        self.assertIn('client_name', errors)
+        self.assertIn('quantity', errors['items']['0'])
+        self.assertEqual(body['results'][2]['errors']['items'][0]['code'], 'required')
+        self.assertIn('__all__', body['results'][3]['errors'])
+        self.assertFalse(Invoice.objects.exists())
+        self.assertFalse(InvoiceItem.objects.exists())
+
+    def test_retries_when_allocated_numbers_are_taken(self):
+        Invoice.objects.create(client_name='Existing', client_address='Dodoma', issue_date='2026-09-01T00:00:00Z')
+        allocate = Invoice.allocate_invoice_numbers
+        taken = [['INV-0001']]
+
+        def allocate_once_taken(count, using=None):
+            # The first allocation collides, as if another writer had won.
+            return taken.pop() if taken else allocate(count, using=using)
+
+        with mock.patch.object(Invoice, 'allocate_invoice_numbers', side_effect=allocate_once_taken):
+            response = self.post([_invoice_record()])
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['results'][0]['invoice_number'], 'INV-0002')
+        self.assertEqual(Invoice.objects.count(), 2)
+        self.assertEqual(InvoiceItem.objects.count(), 2)
+
+    def test_gives_up_after_repeated_number_collisions(self):
+        Invoice.objects.create(client_name='Existing', client_address='Dodoma', issue_date='2026-09-01T00:00:00Z')
+
+        with mock.patch.object(Invoice, 'allocate_invoice_numbers', return_value=['INV-0001']) as allocate:
+            with self.assertRaises(IntegrityError):
+                ingest.ingest_invoices([_invoice_record()])
+
+        self.assertEqual(allocate.call_count, ingest.NUMBER_ALLOCATION_ATTEMPTS)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+
+class AdmissionControlTests(TestCase):
+    """
+    Render admission: requests that cannot get a slot are refused with a 503,
+    and downloads served from a finished render take no slot.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('renderer', password='renderer')
+        self.client.force_login(self.user)
+        self.invoice = Invoice.objects.create(
+            client_name='Mwanza Builders', client_address='Mwanza', issue_date='2026-09-01T00:00:00Z'
+        )
+        CompanyInfo.objects.create(name='Highland Company Ltd')
+        for module, name in ((admission, 'ADMISSION_DIR'), (coalesce, 'COALESCE_DIR')):
+            temp_dir = tempfile.TemporaryDirectory()
+            self.addCleanup(temp_dir.cleanup)
+            patcher = mock.patch.object(module, name, temp_dir.name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for name, value in (('GLOBAL_LIMIT', 1), ('QUEUE_LENGTH', 1), ('QUEUE_WAIT', 0.1)):
+            patcher = mock.patch.object(admission, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fill_every_slot(self):
+        """
+        Takes the only shared slot and the only queue place for another user.
+        """
+        other = User.objects.create_user('other')
+        ticket = admission.admit(other)
+        self.assertTrue(ticket.admitted)
+        self.addCleanup(ticket.release)
+        queue_slot = admission._try_lock('queue-0.lock')
+        self.addCleanup(queue_slot.close)
+
+    def download(self):
+        response = self.client.get(reverse('generator:download_invoice_pdf', args=[self.invoice.pk]))
+        if response.streaming:
+            self.addCleanup(response.close)
+        return response
+
+    def test_full_queue_is_refused_with_retry_after(self):
+        self.fill_every_slot()
+
+        response = self.download()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(admission.RETRY_AFTER))
+        self.assertEqual(admission.read_stats()['rejected_queue_full'], 1)
+
+    def test_wait_in_queue_times_out(self):
+        other = User.objects.create_user('other')
+        ticket = admission.admit(other)
+        self.addCleanup(ticket.release)
+
+        response = self.download()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(admission.read_stats()['rejected_timeout'], 1)
+
+    def test_user_over_their_own_limit_is_refused(self):
+        with mock.patch.object(admission, 'PER_USER_LIMIT', 1):
+            ticket = admission.admit(self.user)
+            self.addCleanup(ticket.release)
+            response = self.download()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(admission.read_stats()['rejected_user'], 1)
+
+    def test_finished_render_is_served_without_a_slot(self):
+        self.assertEqual(self.download().status_code, 200)
+        self.fill_every_slot()
+
+        response = self.download()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(admission.read_stats()['admitted'], 2)
+
+    def test_streamed_export_keeps_its_slot_until_closed(self):
+        response = self.client.get(reverse('generator:export_invoices'), {'format': 'csv', 'rows': 'invoices'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(admission.read_stats()['renders_running'], 1)
+        response.close()
+        self.assertEqual(admission.read_stats()['renders_running'], 0)
+
+
+class RenderOnceTests(TestCase):
+    """
+    Single-flight renders: a finished render is reused, a stuck one is given
+    up on, and only a call that renders enters its slot.
+    """
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        for name, value in (('COALESCE_DIR', temp_dir.name), ('WAIT_TIMEOUT', 0.1)):
+            patcher = mock.patch.object(coalesce, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.renders = 0
+
+    def render(self):
+        self.renders += 1
+        output = tempfile.TemporaryFile()
+        output.write(b'%PDF render ' + str(self.renders).encode())
+        output.seek(0)
+        return output
+
+    def render_once(self, key='a' * 40, **kwargs):
+        output = coalesce.render_once(key, self.render, **kwargs)
+        self.addCleanup(output.close)
+        return output.read()
+
+    def test_reuses_a_finished_render(self):
+        self.assertEqual(self.render_once(), b'%PDF render 1')
+        self.assertEqual(self.render_once(), b'%PDF render 1')
+        self.assertEqual(self.renders, 1)
+
+    def test_renders_each_key_separately(self):
+        self.render_once('a' * 40)
+        self.render_once('b' * 40)
+        self.assertEqual(self.renders, 2)
+
+    def test_renders_again_once_the_result_expires(self):
+        self.render_once()
+        with mock.patch.object(coalesce, 'RESULT_TTL', -1):
+            self.assertEqual(self.render_once(), b'%PDF render 2')
+
+    def test_renders_independently_when_the_lock_is_held_too_long(self):
+        with open(f'{coalesce.COALESCE_DIR}/{"a" * 40}.lock', 'a+b') as held:
+            self.assertTrue(coalesce._try_lock(held))
+            self.assertEqual(self.render_once(), b'%PDF render 1')
+        # The independent render is not published for others to reuse.
+        self.assertEqual(self.render_once(), b'%PDF render 2')
+
+    def test_enters_the_slot_only_to_render(self):
+        slot = mock.MagicMock()
+        self.render_once(slot=slot)
+        self.render_once(slot=slot)
+        self.assertEqual(slot.call_count, 1)
+
+    def test_a_refused_slot_skips_the_render_and_releases_the_lock(self):
+        def refuse():
+            raise RuntimeError("refused")
+
+        with self.assertRaises(RuntimeError):
+            self.render_once(slot=refuse)
+        self.assertEqual(self.renders, 0)
+        self.assertEqual(self.render_once(), b'%PDF render 1')
+
+
+@override_settings(CHANGE_FEED_API_TOKEN='feed-token', DOCUMENT_PREVIEW_BACKGROUND=False)
+class ChangeFeedApiTests(TestCase):
+    """
+    The change feed endpoint: signed cursors, tombstones and conditional
+    requests.
+    """
+
+    def get(self, token='feed-token', **params):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if 'if_none_match' in params:
+            headers['HTTP_IF_NONE_MATCH'] = params.pop('if_none_match')
+        return self.client.get(reverse('generator:api_change_feed'), params, **headers)
+
+    def create_invoice(self, client_name='Mwanza Builders'):
+        return Invoice.objects.create(client_name=client_name, client_address='Mwanza', issue_date='2026-09-01T00:00:00Z')
+
+    def test_pages_through_changes_with_cursors(self):
+        invoices = [self.create_invoice(f'Client {number}') for number in range(3)]
+
+        first = self.get(limit=2).json()
+        second = self.get(limit=2, cursor=first['next_cursor']).json()
+
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        ids = [change['id'] for change in first['changes'] + second['changes']]
+        self.assertEqual(ids, [invoice.pk for invoice in invoices])
+        self.assertEqual(first['changes'][0]['data']['client_name'], 'Client 0')
+        self.assertEqual(self.get(cursor=second['next_cursor']).json()['changes'], [])
+
+    def test_a_changed_row_moves_to_the_end_of_the_feed(self):
+        first = self.create_invoice('First')
+        self.create_invoice('Second')
+        cursor = self.get().json()['next_cursor']
+        first.client_name = 'First, renamed'
+        first.save()
+
+        changes = self.get(cursor=cursor).json()['changes']
+
+        self.assertEqual([change['id'] for change in changes], [first.pk])
+        self.assertEqual(changes[0]['data']['client_name'], 'First, renamed')
+        self.assertEqual(Change.objects.filter(model='invoice').count(), 2)
+
+    def test_deleted_row_becomes_a_tombstone(self):
+        invoice = self.create_invoice()
+        invoice_id = invoice.pk
+        invoice.delete()
+
+        changes = self.get(models='invoice').json()['changes']
+
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['id'], invoice_id)
+        self.assertTrue(changes[0]['deleted'])
+        self.assertNotIn('data', changes[0])
+
+    def test_entries_roll_back_with_the_change(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_invoice()
+                raise RuntimeError("abort")
+
+        self.assertFalse(Change.objects.exists())
+
+    def test_models_narrow_the_feed(self):
+        invoice = self.create_invoice()
+        InvoiceItem.objects.create(invoice=invoice, description='Grout', quantity=2, unit_price=1500)
+
+        changes = self.get(models='invoice_item').json()['changes']
+
+        self.assertEqual([change['model'] for change in changes], ['invoice_item'])
+
+    def test_unchanged_page_answers_304(self):
+        self.create_invoice()
+        response = self.get()
+        etag = response['ETag']
+
+        self.assertEqual(self.get(if_none_match=etag).status_code, 304)
+        self.create_invoice('Dodoma Traders')
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_rejects_forged_and_tampered_cursors(self):
+        self.create_invoice()
+        cursor = self.get().json()['next_cursor']
+        # Edited, signed for another purpose, unsigned, and a signed negative.
+        for bad_cursor in (cursor + 'x', signing.dumps(0), 'garbage', changefeed.encode_cursor(-1)):
+            with self.subTest(cursor=bad_cursor):
+                response = self.get(cursor=bad_cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], "Invalid cursor.")
+
+    def test_rejects_unknown_models_and_bad_limits(self):
+        self.assertEqual(self.get(models='invoice,payroll').status_code, 400)
+        self.assertEqual(self.get(limit='many').status_code, 400)
+
+    def test_rejects_missing_or_wrong_token(self):
+        for token in (None, 'wrong-token'):
+            with self.subTest(token=token):
+                self.assertEqual(self.get(token=token).status_code, 401)
@@ -37,7 +37,20 @@ urlpatterns = [
     path('invoices/preview/<int:invoice_id>/', views.invoice_preview, name='invoice_preview'),
     path('invoices/download/pdf/<int:invoice_id>/', views.download_invoice_pdf, name='download_invoice_pdf'),
     path('invoices/print/<int:invoice_id>/', views.invoice_print, name='invoice_print'),
+    path('invoices/export/', views.export_invoices, name='export_invoices'),
     path('package/download/<int:employee_id>/<int:invoice_id>/', views.download_welcome_package, name='download_welcome_package'),
+    path('package/download/invoice/<int:invoice_id>/', views.download_welcome_packages, name='download_welcome_packages'),
+
+    # ==============================================================================
+    # API URLS
+    # ==============================================================================
+    path('api/invoices/bulk/', views.api_ingest_invoices, name='api_ingest_invoices'),
+    path('api/changes/', views.api_change_feed, name='api_change_feed'),
+
+    # ==============================================================================
+    # PREVIEW IMAGE URLS
+    # ==============================================================================
+    path('previews/<str:kind>/<int:object_id>/<str:fingerprint>.<str:fmt>', views.document_preview, name='document_preview'),
 
     
 ]
\ No newline at end of file
@@ -1,16 +1,33 @@
 # generator/views.py
 
+import json
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import FileResponse
-from django.forms import inlineformset_factory
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.contrib import messages
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 # Import all the models we need from our models.py file
 from .models import Employee, CompanyInfo, BusinessCard, Invoice, InvoiceItem
-# Import our PDF generation utilities
-from .pdf_utils import generate_id_card_pdf, generate_invoice_pdf
-from .pdf_utils import generate_welcome_package_pdf
+from .search import SearchResults
+from .forms import InvoiceExportForm, InvoiceForm, InvoiceItemFormSet
+from .ingest import IngestError, ingest_invoices
+from . import changefeed, coalesce, exports, previews, routers
+from .admission import RenderRefused, admission_controlled, admit, busy_response, render_slot
+from .pdf_output import pdf_response
 from django.contrib.auth.decorators import login_required
 
+# NOTE: The PDF utilities (reportlab, humanize) are imported inside the download
+# views so workers, migrations and management commands don't pay for the whole
+# rendering stack at startup. See generator/warmup.py for preloading.
+
 
 def splash_page(request):
     """
@@ -24,6 +41,8 @@ def splash_page(request):
 # ==============================================================================
 # DASHBOARD VIEWS
 # ==============================================================================
+INVOICE_DASHBOARD_PAGE_SIZE = 50
+
 
 @login_required
 def id_card_dashboard(request):
@@ -41,11 +60,25 @@ def id_card_dashboard(request):
 @login_required
 def invoice_dashboard(request):
     """
-    Displays a list of all created invoices.
+    Displays a list of all created invoices. When a `q` search term is given,
+    only the matching invoices are shown, best match first.
     """
-    invoices = Invoice.objects.all().order_by('-issue_date')
+    query = request.GET.get('q', '').strip()
+    if query:
+        invoices = SearchResults(query)
+    else:
+        invoices = Invoice.objects.all().order_by('-issue_date', '-pk')
+    page = Paginator(invoices, INVOICE_DASHBOARD_PAGE_SIZE).get_page(request.GET.get('page'))
+    invoices = list(page.object_list)
+    # Items feed both the totals column and the preview fingerprints; only
+    # the invoices on this page are loaded and fingerprinted.
+    prefetch_related_objects(invoices, 'items')
+    previews.attach_preview_urls('invoice', invoices, CompanyInfo.objects.first())
     context = {
-        'invoices': invoices
+        'invoices': invoices,
+        'page_obj': page,
+        'query': query,
+        'export_form': InvoiceExportForm(),
     }
     return render(request, 'generator/invoice_dashboard.html', context)
 
@@ -86,9 +119,17 @@ def download_id_card_pdf(request, employee_id):
     """
     employee = get_object_or_404(Employee, id=employee_id)
     company_info = CompanyInfo.objects.first()
-    pdf_buffer = generate_id_card_pdf(employee, company_info)
+    from .layouts import LayoutError
+    try:
+        pdf_buffer = coalesce.generate_id_card_pdf(
+            employee, company_info, layout=request.GET.get('layout'), slot=lambda: render_slot(request.user)
+        )
+    except LayoutError as exc:
+        raise Http404(str(exc))
+    except RenderRefused as exc:
+        return busy_response(exc.ticket)
     filename = f"Highland_ID_Card_{employee.employee_id}.pdf"
-    return FileResponse(pdf_buffer, as_attachment=True, filename=filename)
+    return pdf_response(pdf_buffer, filename)
 
 
 # ==============================================================================
@@ -118,40 +159,21 @@ def create_invoice(request):
     """
     Handles the creation of a new invoice with its line items.
     """
-    InvoiceItemFormSet = inlineformset_factory(
-        Invoice, InvoiceItem, fields=('description', 'quantity', 'unit_price'),
-        extra=1, can_delete=True
-    )
-
     if request.method == 'POST':
-        due_date_str = request.POST.get('due_date')
-        due_date = due_date_str if due_date_str else None
-
-        # --- THIS IS THE FIX ---
-        # We REMOVE 'tax_rate' and ADD 'client_phone'.
-        invoice = Invoice.objects.create(
-            invoice_number=request.POST.get('invoice_number', ''),
-            issue_date=request.POST.get('issue_date'),
-            due_date=due_date,
-            client_name=request.POST.get('client_name', ''),
-            client_address=request.POST.get('client_address', ''),
-            client_phone=request.POST.get('client_phone', ''), # ADD this line
-            other_comments=request.POST.get('other_comments', ''),
-            terms_of_payment=request.POST.get('terms_of_payment', '')
-        )
-        # --- END OF FIX ---
-        
-        formset = InvoiceItemFormSet(request.POST, instance=invoice)
-        
-        if formset.is_valid():
-            formset.save()
+        # Validate the invoice and all of its items before writing anything.
+        invoice_form = InvoiceForm(request.POST)
+        formset = InvoiceItemFormSet(request.POST)
+
+        if invoice_form.is_valid() and formset.is_valid():
+            with transaction.atomic():
+                invoice = invoice_form.save()
+                formset.instance = invoice
+                formset.save()
             messages.success(request, f"Invoice {invoice.invoice_number} created successfully!")
             return redirect('generator:invoice_preview', invoice_id=invoice.id)
         else:
-            invoice.delete()
             messages.error(request, "Please correct the errors in the invoice items.")
-            formset_with_errors = InvoiceItemFormSet(request.POST)
-            context = {'formset': formset_with_errors}
+            context = {'formset': formset, 'invoice_form': invoice_form}
             return render(request, 'generator/create_invoice.html', context)
 
     else:
@@ -181,17 +203,126 @@ def download_invoice_pdf(request, invoice_id):
     """
     Generates and serves a print-ready PDF of the final invoice.
     """
-    invoice = get_object_or_404(Invoice, id=invoice_id)
+    invoice = get_object_or_404(Invoice.objects.prefetch_related('items'), id=invoice_id)
     company_info = CompanyInfo.objects.first()
 
-    # Call the PDF generation utility to create the PDF in memory.
-    pdf_buffer = generate_invoice_pdf(invoice, company_info)
+    # Concurrent downloads of the same invoice share one render, and only the
+    # request that renders takes an admission slot.
+    from .layouts import LayoutError
+    try:
+        pdf_buffer = coalesce.generate_invoice_pdf(
+            invoice, company_info, layout=request.GET.get('layout'), slot=lambda: render_slot(request.user)
+        )
+    except LayoutError as exc:
+        raise Http404(str(exc))
+    except RenderRefused as exc:
+        return busy_response(exc.ticket)
 
     # Create a clean filename for the download.
     filename = f"Invoice_{invoice.invoice_number}_{invoice.client_name.replace(' ', '_')}.pdf"
 
     # Serve the generated PDF as a file download.
-    return FileResponse(pdf_buffer, as_attachment=True, filename=filename)
+    return pdf_response(pdf_buffer, filename)
+
+@login_required
+@admission_controlled
+@require_GET
+def export_invoices(request):
+    """
+    Streams invoices or their line items as CSV or XLSX for accounting.
+    Accepts format, rows, date_from, date_to, client and status filters.
+    """
+    form = InvoiceExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    filters = form.cleaned_data
+    header, make_rows = exports.EXPORTS[filters['rows']]
+    write, content_type = exports.FORMATS[filters['format']]
+    title = 'Line items' if filters['rows'] == 'items' else 'Invoices'
+    # The rows are read while the response streams, after the request's
+    # routing scope has ended, so pick the database now.
+    rows = make_rows(filters, using=routers.read_alias())
+    response = StreamingHttpResponse(write(header, rows, title), content_type=content_type)
+    filename = f"Highland_{filters['rows']}_{filters.get('date_from') or 'all'}_{filters.get('date_to') or 'all'}.{filters['format']}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _has_api_token(request, token):
+    """
+    True if the request sends "Authorization: Bearer <token>". Always False
+    while no token is configured, which disables the endpoint.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    return bool(token) and constant_time_compare(auth_header, f"Bearer {token}")
+
+
+@csrf_exempt
+@require_POST
+def api_ingest_invoices(request):
+    """
+    Accepts a JSON batch of invoices (a list, or {"invoices": [...]}) from an
+    external system. The whole batch is validated first and then written in a
+    single transaction; the response has one result per submitted invoice.
+    """
+    if not _has_api_token(request, settings.INVOICE_INGEST_API_TOKEN):
+        return JsonResponse({'error': "Invalid or missing API token."}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': "Request body must be valid JSON."}, status=400)
+    records = payload.get('invoices') if isinstance(payload, dict) else payload
+
+    try:
+        created, results = ingest_invoices(records)
+    except IngestError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    if not created:
+        return JsonResponse({'created': 0, 'results': results}, status=400)
+    return JsonResponse({'created': len(results), 'results': results}, status=201)
+
+
+@require_GET
+def api_change_feed(request):
+    """
+    Returns the changes to employees, business cards, invoices and line items
+    after `cursor` (omit it to start from the beginning), oldest first. Pass
+    the response's next_cursor on the next call and keep calling while
+    has_more is true. `models` narrows the feed (comma-separated) and `limit`
+    caps the entries scanned. Unchanged pages answer If-None-Match with 304.
+    """
+    if not _has_api_token(request, settings.CHANGE_FEED_API_TOKEN):
+        return JsonResponse({'error': "Invalid or missing API token."}, status=401)
+
+    models = None
+    if request.GET.get('models'):
+        models = set(request.GET['models'].split(','))
+        unknown = models - set(changefeed.FEED_MODELS)
+        if unknown:
+            return JsonResponse({'error': f"Unknown models: {', '.join(sorted(unknown))}."}, status=400)
+    try:
+        limit = int(request.GET.get('limit', changefeed.PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'error': "limit must be a whole number."}, status=400)
+    limit = min(max(limit, 1), changefeed.MAX_PAGE_SIZE)
+    try:
+        after = changefeed.decode_cursor(request.GET.get('cursor'))
+    except changefeed.CursorError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    entries, last, has_more, etag = changefeed.read_page(after, models, limit)
+    response = get_conditional_response(request, etag=quote_etag(etag))
+    if response is None:
+        response = JsonResponse({
+            'changes': changefeed.serialize(entries),
+            'next_cursor': changefeed.encode_cursor(last),
+            'has_more': has_more,
+        })
+    response['ETag'] = quote_etag(etag)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 def invoice_print(request, invoice_id):
@@ -211,16 +342,61 @@ def download_welcome_package(request, employee_id, invoice_id):
     """
     Generates a single PDF containing the invoice and ID card for a new hire.
     """
-    employee = get_object_or_404(Employee, id=employee_id)
-    invoice = get_object_or_404(Invoice, id=invoice_id)
+    employee = get_object_or_404(Employee.objects.select_related('business_card'), id=employee_id)
+    invoice = get_object_or_404(Invoice.objects.prefetch_related('items'), id=invoice_id)
     company_info = CompanyInfo.objects.first()
+    if company_info is None:
+        return HttpResponseBadRequest("Add the company information before generating documents.")
 
     # Call the new all-in-one PDF generation utility
-    pdf_buffer = generate_welcome_package_pdf(employee, invoice, company_info)
+    from .layouts import LayoutError
+    try:
+        pdf_buffer = coalesce.generate_welcome_package_pdf(
+            employee, invoice, company_info, layout=request.GET.get('layout'), slot=lambda: render_slot(request.user)
+        )
+    except LayoutError as exc:
+        raise Http404(str(exc))
+    except RenderRefused as exc:
+        return busy_response(exc.ticket)
     
     filename = f"Welcome_Package_{employee.full_name.replace(' ', '_')}.pdf"
     
-    return FileResponse(pdf_buffer, as_attachment=True, filename=filename)
+    return pdf_response(pdf_buffer, filename)
+
+@login_required
+@admission_controlled
+def download_welcome_packages(request, invoice_id):
+    """
+    Generates one PDF holding the welcome package of every selected employee
+    (?employee=<id>, repeatable, at most WELCOME_PACKAGE_MAX_EMPLOYEES)
+    against a single invoice.
+    """
+    invoice = get_object_or_404(Invoice, id=invoice_id)
+    company_info = CompanyInfo.objects.first()
+    if company_info is None:
+        return HttpResponseBadRequest("Add the company information before generating documents.")
+    try:
+        employee_ids = {int(employee_id) for employee_id in request.GET.getlist('employee')}
+    except ValueError:
+        return HttpResponseBadRequest("Employee ids must be whole numbers.")
+    if not employee_ids:
+        return HttpResponseBadRequest("Select at least one employee (?employee=<id>).")
+    max_employees = getattr(settings, 'WELCOME_PACKAGE_MAX_EMPLOYEES', 50)
+    if len(employee_ids) > max_employees:
+        return HttpResponseBadRequest(f"At most {max_employees} employees can be packaged at once.")
+    employees = list(Employee.objects.select_related('business_card').filter(id__in=employee_ids).order_by('full_name'))
+    if not employees:
+        raise Http404("None of the selected employees exist.")
+
+    from .layouts import LayoutError
+    from .pdf_utils import generate_welcome_packages_pdf
+    try:
+        pdf_buffer = generate_welcome_packages_pdf(employees, invoice, company_info, layout=request.GET.get('layout'))
+    except LayoutError as exc:
+        raise Http404(str(exc))
+
+    filename = f"Welcome_Packages_{invoice.invoice_number}.pdf"
+    return pdf_response(pdf_buffer, filename)
 
 @login_required
 def id_card_print(request, employee_id):
@@ -260,8 +436,48 @@ def employee_list_dashboard(request):
     Displays a dedicated page with a list of all employees for
     generating their documents.
     """
-    employees = Employee.objects.all().order_by('full_name')
+    employees = previews.attach_preview_urls(
+        'id_card', Employee.objects.all().order_by('full_name'), CompanyInfo.objects.first()
+    )
     context = {
         'employees': employees
     }
-    return render(request, 'generator/employee_list_dashboard.html', context)
\ No newline at end of file
+    return render(request, 'generator/employee_list_dashboard.html', context)
+
+
+# ==============================================================================
+# DOCUMENT PREVIEW IMAGES
+# ==============================================================================
+PREVIEW_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+@login_required
+@require_GET
+def document_preview(request, kind, object_id, fingerprint, fmt):
+    """
+    Serves the raster preview stored under `fingerprint`. The image behind a
+    fingerprint never changes, so it is cached by the browser for a year. A
+    stale fingerprint redirects to the current one; a missing preview is
+    rendered once and stored.
+    """
+    if kind not in previews.PREVIEW_WIDTHS or fmt not in previews.PREVIEW_FORMATS:
+        raise Http404("Unknown preview.")
+    if not previews.is_fingerprint(fingerprint):
+        raise Http404("Unknown preview.")
+
+    name = previews.storage_name(kind, object_id, fingerprint, fmt)
+    if not default_storage.exists(name):
+        instance = previews.load_instance(kind, object_id)
+        company_info = CompanyInfo.objects.first()
+        if instance is None or company_info is None:
+            raise Http404("Unknown preview.")
+        current = previews.fingerprint(kind, instance, company_info)
+        if current != fingerprint:
+            return redirect('generator:document_preview', kind=kind, object_id=object_id, fingerprint=current, fmt=fmt)
+        with admit(request.user) as ticket:
+            if not ticket.admitted:
+                return busy_response(ticket)
+            name = previews.ensure_preview(kind, instance, company_info, fmt)
+
+    response = FileResponse(default_storage.open(name), content_type=f'image/{fmt}')
+    response['Cache-Control'] = PREVIEW_CACHE_CONTROL
+    return response
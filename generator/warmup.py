@@ -0,0 +1,38 @@
+# generator/warmup.py
+
+import io
+import time
+
+# ==============================================================================
+# OPTIONAL WARM-UP FOR PRELOADED SERVERS
+# ==============================================================================
+# The PDF and imaging stacks are imported lazily so short-lived processes
+# (migrations, management commands) start quickly. A long-lived preloaded
+# gunicorn master is the opposite case: paying the cost once before forking
+# means every worker starts with it already in shared memory, and the first
+# download after a deploy isn't slow. gunicorn.conf.py calls warm_up().
+
+
+def warm_up():
+    """
+    Imports the rendering and imaging dependencies and primes their internal
+    caches (font metrics, image plugins). Returns the time taken in seconds.
+    """
+    started = time.perf_counter()
+
+    from PIL import Image
+    Image.init()
+
+    from . import pdf_utils  # noqa: F401
+    from .models import make_qr_code_png
+    make_qr_code_png('warm-up')
+
+    # Drawing a throwaway page loads the standard font metrics once.
+    from reportlab.pdfgen import canvas
+    p = canvas.Canvas(io.BytesIO())
+    for font_name in ('Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique'):
+        p.setFont(font_name, 9)
+        p.drawString(0, 0, 'warm-up')
+    p.save()
+
+    return time.perf_counter() - started
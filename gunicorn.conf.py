@@ -0,0 +1,60 @@
+# gunicorn.conf.py
+#
+# Worker profile for the Highland DMS web service. Gunicorn loads this file
+# automatically from the working directory; render.yaml also passes it with -c.
+# Every value can be overridden through the environment for experiments with
+# `manage.py loadtest --spawn`.
+
+import multiprocessing
+import os
+
+# Render sets PORT; gunicorn binds to 0.0.0.0:$PORT by default when it is set.
+if os.environ.get('GUNICORN_BIND'):
+    bind = os.environ['GUNICORN_BIND']
+
+# Tuned with `manage.py loadtest --spawn` (mixed scenario, 8 users, 20 s, seeded
+# SQLite with 20 employees / 200 invoices, 1 vCPU):
+#
+#   profile                 req/s   p50 ms   p95 ms
+#   sync    x2                11.1     188     2592
+#   sync    x4                10.5     163     3077
+#   gthread x2, 4 threads     11.3     188     2614
+#   gthread x2, 2 threads     11.4     288     1758
+#   gthread x4, 2 threads      9.3     164     2831
+#
+# PDF rendering is CPU-bound, so extra processes beyond the core count only
+# add memory and context switching. A couple of threads per worker lets the
+# cheap, I/O-bound pages overlap with a render instead of queueing behind it,
+# which is where the p95 improvement comes from.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, multiprocessing.cpu_count() + 1)))
+threads = int(os.environ.get('GUNICORN_THREADS', 2))
+
+# Import Django and the app once in the master so workers fork with the code
+# already loaded (faster boots, shared memory pages).
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically to bound slow RSS growth from rendering.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', None)
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork, so
+    # with preload_app the rendering stack is imported once and shared.
+    if preload_app and os.environ.get('GUNICORN_WARMUP', '1') == '1':
+        from generator.warmup import warm_up
+        server.log.info("Warmed up rendering stack in %.0f ms", warm_up() * 1000)
+
+
+def post_worker_init(worker):
+    # A worker whose memory keeps growing across renders retires itself
+    # gracefully and is replaced (see generator/memory.py).
+    from generator import memory
+    memory.enable_worker_recycling()